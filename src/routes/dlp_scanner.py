@@ -3,21 +3,46 @@ DLP Scanner routes for Google Drive Sensitive Data Scanner
 """
 import os
 import json
+import orjson
 import logging
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, send_file
+from functools import cached_property, lru_cache
+from cachetools import LRUCache, TTLCache
+from flask import Blueprint, Response, jsonify, request, send_file
 from google.cloud import dlp_v2, storage
 from google.oauth2 import service_account
 from google.auth import default
+from google.api_core.exceptions import Conflict, NotFound, PreconditionFailed
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaIoBaseDownload, build_http
 import tempfile
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import time
+import random
+import bisect
+import heapq
+import uuid
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from google_auth_httplib2 import AuthorizedHttp
+import gzip
 import io
+import re
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+try:
+    # google-re2 matches in linear time without backtracking, much faster
+    # than re for the prefilter's alternation over large text. It is in
+    # requirements.txt; re is only a fallback for environments without it.
+    import re2 as prefilter_re
+except ImportError:
+    prefilter_re = re
 
 dlp_bp = Blueprint('dlp', __name__)
 
@@ -25,39 +50,341 @@ dlp_bp = Blueprint('dlp', __name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# OAuth scopes requested for the Drive client
+DRIVE_SCOPES = (
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/drive.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+    'https://www.googleapis.com/auth/drive.file'
+)
+
+# Drive rejects large batches with 500s, so metadata batches start small and
+# adapt: halved when Drive throttles or fails, grown again after clean batches
+DRIVE_BATCH_SIZE = 25
+DRIVE_BATCH_SIZE_MAX = 100
+DRIVE_BATCH_GROWTH_WINDOW = 50
+DRIVE_BATCH_GROWTH_STEP = 5
+# Statuses worth retrying after backing off
+DRIVE_RETRYABLE_STATUSES = {429, 500, 502, 503}
+
+# Concurrent media downloads, kept under Drive's per-user rate limit
+DRIVE_DOWNLOAD_CONCURRENCY = int(os.environ.get('DRIVE_DOWNLOAD_CONCURRENCY', 10))
+# Long-lived workers for Drive calls made on behalf of request threads, so
+# their connections are reused from one request to the next
+DRIVE_API_CONCURRENCY = int(os.environ.get('DRIVE_API_CONCURRENCY', 8))
+
+# Retries (with exponential backoff) for rate-limited or failed Drive requests
+DRIVE_NUM_RETRIES = 5
+# Only the File fields the scanner uses, instead of the full Drive resource
+DRIVE_FILE_FIELDS = 'id,name,mimeType,size,md5Checksum,version'
+# Recently fetched File metadata, so single-file scans of files seen in the
+# last few minutes go straight to the media download
+DRIVE_METADATA_CACHE_SIZE = 10000
+DRIVE_METADATA_TTL = int(os.environ.get('DRIVE_METADATA_TTL', 300))
+# Media downloads stream in large chunks to cut per-request overhead on big files
+DRIVE_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Binary files at least this large are fetched as concurrent ranged GETs
+# instead of one sequential stream (Workspace exports cannot be ranged)
+DRIVE_PARALLEL_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+DRIVE_RANGE_SIZE = 32 * 1024 * 1024
+DRIVE_RANGE_CONCURRENCY = int(os.environ.get('DRIVE_RANGE_CONCURRENCY', 4))
+# Downloads larger than this spill to a temporary file and are inspected and
+# vaulted from disk. Memory per file is then bounded by the spool size, or by
+# the ranges in flight (DRIVE_RANGE_CONCURRENCY x DRIVE_RANGE_SIZE) for
+# files large enough to be downloaded in ranges.
+DRIVE_SPOOL_SIZE = 8 * 1024 * 1024
+# Chunk size for resumable vault uploads (uploads under 8 MB always go in one
+# request). Unset keeps the client default of 100 MB, i.e. one request per
+# file up to that size; set it lower only to bound memory on huge files.
+GCS_UPLOAD_CHUNK_SIZE = int(os.environ['GCS_UPLOAD_CHUNK_MB']) * 1024 * 1024 if os.environ.get('GCS_UPLOAD_CHUNK_MB') else None
+# (connect, read) timeouts for GCS uploads, allowing large vault files time to finish
+GCS_UPLOAD_TIMEOUT = (5, 120)
+# Background workers for GCS uploads during batch scans
+GCS_UPLOAD_CONCURRENCY = int(os.environ.get('GCS_UPLOAD_CONCURRENCY', 16))
+# Concurrent scan result downloads when status views read stored results
+GCS_DOWNLOAD_CONCURRENCY = int(os.environ.get('GCS_DOWNLOAD_CONCURRENCY', 32))
+# Concurrent DLP inspections during batch scans, kept low to respect DLP quota
+DLP_INSPECT_CONCURRENCY = int(os.environ.get('DLP_INSPECT_CONCURRENCY', 4))
+# Files a batch scan may hold in memory between download and upload
+SCAN_PIPELINE_DEPTH = int(os.environ.get('SCAN_PIPELINE_DEPTH', 8))
+
+# DLP inspects at most 0.5 MB per request, so larger content is sent in chunks.
+# Chunks overlap so findings that straddle a boundary are still detected.
+DLP_CHUNK_SIZE = 256 * 1024
+DLP_CHUNK_OVERLAP = 1024
+# Binary documents (PDF, Office, images) can't be split without breaking their
+# format, so they are sent whole and rejected above DLP's request limit
+DLP_MAX_BINARY_SIZE = 512 * 1024
+# Small text files in a batch scan share DLP requests of up to DLP_CHUNK_SIZE,
+# joined by a delimiter that keeps findings from running across files
+DLP_PACK_FILE_SIZE = 64 * 1024
+DLP_PACK_DELIMITER = b"\n\x1f===FILE===\x1f\n"
+# Scan summaries are bundled into NDJSON shards under their own prefix so
+# status views need one read per shard instead of one per scanned file
+SCAN_INDEX_PREFIX = 'scan_index/'
+SCAN_INDEX_SHARD_SIZE = 100
+# Once there are more shards than this, index writes merge the oldest ones
+# (up to GCS's 32-source compose limit) so the shard count stays bounded
+SCAN_INDEX_COMPACT_THRESHOLD = 16
+SCAN_INDEX_COMPACT_MAX_SOURCES = 32
+# Results with more findings than this are streamed to GCS, smaller ones
+# go up in a single request
+SCAN_RESULTS_STREAM_FINDINGS = 1000
+# Only the object fields read when listing scan results and index shards
+SCAN_RESULT_LIST_FIELDS = 'items(name,timeCreated,updated),nextPageToken'
+# Latest scan per file id with the content it saw, so batch scans can skip unchanged files
+SCAN_CACHE_BLOB = 'scan_cache/content_index.json'
+# Attempts at the generation-matched cache write before updates wait for the next save
+SCAN_CACHE_SAVE_ATTEMPTS = 3
+# Seconds a computed dashboard or PDF report is served again before it is
+# rebuilt; storing a new scan result on this instance drops it sooner
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+# Reports requested with "async" render on a small pool of their own and are
+# stored under REPORT_PREFIX so any instance can serve them when done
+REPORT_PREFIX = 'reports/'
+REPORT_CONCURRENCY = 2
+# Seconds an instance remembers the reports it started, for pending/failed status
+REPORT_STATUS_TTL = 3600
+
+# Built-in infoTypes to scan for sensitive data
+_INFO_TYPES = (
+    "PERSON_NAME",
+    "EMAIL_ADDRESS",
+    "PHONE_NUMBER",
+    "US_SOCIAL_SECURITY_NUMBER",
+    "CREDIT_CARD_NUMBER",
+    "US_DRIVERS_LICENSE_NUMBER",
+    "US_PASSPORT",
+    "DATE_OF_BIRTH",
+    "MEDICAL_RECORD_NUMBER",
+    "US_BANK_ROUTING_MICR",
+    "IBAN_CODE",
+    "SWIFT_CODE"
+)
+
+# Media, archives, executables and untyped binaries yield nothing DLP can
+# read as text, so they are not downloaded unless DLP_SCAN_MEDIA is enabled
+DLP_SCAN_MEDIA = os.environ.get('DLP_SCAN_MEDIA', 'false').lower() == 'true'
+_UNSCANNABLE_MIME_PREFIXES = ('image/', 'video/', 'audio/', 'font/')
+_UNSCANNABLE_MIME_TYPES = {
+    'application/zip',
+    'application/gzip',
+    'application/x-gzip',
+    'application/x-tar',
+    'application/x-7z-compressed',
+    'application/x-rar-compressed',
+    'application/vnd.rar',
+    'application/x-bzip2',
+    'application/java-archive',
+    'application/x-msdownload',
+    'application/x-executable',
+    'application/x-iso9660-image',
+    'application/octet-stream',
+    'application/vnd.google-apps.folder',
+    'application/vnd.google-apps.shortcut'
+}
+
+# Optional local prefilter: text chunks with no email address, digit run or
+# custom-pattern match skip the DLP call. Name-only content (PERSON_NAME) is
+# not detected by it, so it stays off unless DLP_PREFILTER is enabled.
+DLP_PREFILTER_ENABLED = os.environ.get('DLP_PREFILTER', 'false').lower() == 'true'
+_PREFILTER_PATTERN = '|'.join([
+    r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",  # email
+    r"\d[\d\s()./-]{6,}\d",  # SSN, card, phone, routing, passport and date-like digit runs
+    r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,30}\b",  # IBAN
+    r"EMP-\d{6}",
+    r"REF-\d{4}-\d{4}",
+    r"[a-zA-Z0-9]{32,}",
+    r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b",
+    r"(?:jdbc|mysql|postgresql|mongodb)://"
+])
+_PREFILTER_RE = prefilter_re.compile(_PREFILTER_PATTERN)
+_PREFILTER_BYTES_RE = prefilter_re.compile(_PREFILTER_PATTERN.encode())
+# MIME types besides text/* whose content reaches DLP as plain text, the only
+# kind the prefilter can judge and small-file packing can concatenate
+_TEXT_MIME_TYPES = (
+    'application/json',
+    'application/xml',
+    'application/vnd.google-apps.document',
+    'application/vnd.google-apps.spreadsheet',
+    'application/vnd.google-apps.presentation'
+)
+
+# Likelihood enum values as returned on raw protobuf findings
+_LIKELIHOOD_NAMES = {likelihood.value: likelihood.name for likelihood in dlp_v2.Likelihood}
+
+# Distinct custom-pattern configurations kept as ready-built InspectConfig protos
+INSPECT_CONFIG_CACHE_SIZE = 64
+
+# Base inspect config shared by every DLP request
+_INSPECT_CONFIG = {
+    "info_types": [{"name": name} for name in _INFO_TYPES],
+    "min_likelihood": dlp_v2.Likelihood.POSSIBLE,
+    "limits": {"max_findings_per_request": 100},
+    "include_quote": True
+}
+
+@lru_cache(maxsize=1)
+def _default_credentials():
+    """Application default credentials for DRIVE_SCOPES, resolved once per process.
+    
+    default() reads the ADC file and may query the metadata server; the
+    credentials it returns refresh their own token when it nears expiry.
+    """
+    return default(scopes=DRIVE_SCOPES)
+
+def _has_nested_quantifier(parsed, repeated=False):
+    """Whether a parsed regex repeats something that itself contains a repeat, like (a+)+"""
+    for op, av in parsed:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            _, max_repeat, item = av
+            unbounded = max_repeat > 1
+            if unbounded and repeated:
+                return True
+            if _has_nested_quantifier(item, repeated or unbounded):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(_has_nested_quantifier(branch, repeated) for branch in av[1]):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if _has_nested_quantifier(av[-1], repeated):
+                return True
+    return False
+
+@lru_cache(maxsize=256)
+def compile_custom_pattern(pattern):
+    """Compile a custom detection pattern, rejecting ones open to catastrophic backtracking.
+    
+    DLP runs custom regexes with RE2, so when google-re2 is installed the
+    pattern is compiled with it: that accepts exactly DLP's syntax and
+    matches in linear time. With only re available, nested quantifiers
+    such as (a+)+ are rejected instead. Errors are raised as re.error.
+    """
+    if prefilter_re is not re:
+        try:
+            return prefilter_re.compile(pattern)
+        except prefilter_re.error as e:
+            message = e.args[0] if e.args else 'invalid pattern'
+            raise re.error(message.decode() if isinstance(message, bytes) else str(message)) from None
+    
+    compiled = re.compile(pattern)
+    if _has_nested_quantifier(sre_parse.parse(pattern)):
+        raise re.error("nested quantifiers can backtrack catastrophically")
+    return compiled
+
+def _blob_timestamp(scan_timestamp):
+    """YYYYMMDD_HHMMSS for blob names, sliced from a scan_timestamp ISO string"""
+    # Slicing skips strftime, and results and vault copies of one scan share a name
+    return (f"{scan_timestamp[0:4]}{scan_timestamp[5:7]}{scan_timestamp[8:10]}_"
+            f"{scan_timestamp[11:13]}{scan_timestamp[14:16]}{scan_timestamp[17:19]}")
+
+def scan_statistics(scan_data, since=None):
+    """Counts and rates over scan summaries, shared by the status, dashboard and report views"""
+    # One pass; scan timestamps are UTC ISO strings, so recency is a string comparison
+    total = len(scan_data)
+    files_with_findings = 0
+    errored = 0
+    total_findings = 0
+    recent_scans = 0
+    for s in scan_data:
+        findings_count = s.get('findings_count', 0)
+        total_findings += findings_count
+        if s.get('error'):
+            errored += 1
+        elif findings_count > 0:
+            files_with_findings += 1
+        if since is not None and (s.get('scan_timestamp') or '') > since:
+            recent_scans += 1
+    clean_files = total - files_with_findings - errored
+    return {
+        'total': total,
+        'files_with_findings': files_with_findings,
+        'clean_files': clean_files,
+        'errored': errored,
+        'total_findings': total_findings,
+        'recent_scans': recent_scans,
+        'scan_success_rate': round((total - errored) / total * 100, 2) if total > 0 else 0,
+        'clean_file_rate': round(clean_files / total * 100, 2) if total > 0 else 0
+    }
+
 class DLPScanner:
     def __init__(self):
-        self.dlp_client = None
-        self.storage_client = None
         self.project_id = os.environ.get('GOOGLE_CLOUD_PROJECT')
-        
-        # Initialize clients
-        self._init_clients()
+        # Storage clients are thread-safe, so uploads can overlap with scanning
+        self._io_pool = ThreadPoolExecutor(max_workers=GCS_UPLOAD_CONCURRENCY)
+        # Stored results are small, so reading many at once is bound by round trips
+        self._gcs_read_pool = ThreadPoolExecutor(max_workers=GCS_DOWNLOAD_CONCURRENCY)
+        # Pipeline stages for batch scans, see scan_many
+        self._download_pool = ThreadPoolExecutor(max_workers=DRIVE_DOWNLOAD_CONCURRENCY)
+        # Separate from _download_pool so a large file never waits on its own pool
+        self._range_pool = ThreadPoolExecutor(max_workers=DRIVE_RANGE_CONCURRENCY)
+        self._inspect_pool = ThreadPoolExecutor(max_workers=DLP_INSPECT_CONCURRENCY)
+        # Request threads are short-lived, so their Drive calls run here instead
+        self._drive_api_pool = ThreadPoolExecutor(max_workers=DRIVE_API_CONCURRENCY)
+        # InspectConfig protos keyed by include_custom_types and custom patterns
+        self._inspect_configs = LRUCache(maxsize=INSPECT_CONFIG_CACHE_SIZE)
+        self._inspect_configs_lock = threading.Lock()
+        # Drive File metadata keyed by file id, filled by every metadata fetch
+        self._file_metadata = TTLCache(maxsize=DRIVE_METADATA_CACHE_SIZE, ttl=DRIVE_METADATA_TTL)
+        self._file_metadata_lock = threading.Lock()
+        
+        # Clients are created on first use so importing the module does no auth or network work
+        self.drive_credentials = None
+        self._local = threading.local()
+        
+        # Adaptive Drive metadata batch size, shared by all requests
+        self._drive_batch_size = DRIVE_BATCH_SIZE
+        self._drive_batch_successes = 0
+        self._drive_batch_lock = threading.Lock()
+        
+        # Results bucket handle, kept once the bucket is known to exist
+        self._results_bucket = None
+        self._results_bucket_lock = threading.Lock()
+        
+        # Computed dashboards and rendered reports, keyed by results bucket name and view
+        self._view_cache = TTLCache(maxsize=16, ttl=DASHBOARD_CACHE_TTL)
+        self._view_cache_lock = threading.Lock()
+        
+        # Background PDF reports started here, by report id
+        self._report_pool = ThreadPoolExecutor(max_workers=REPORT_CONCURRENCY)
+        self._reports = TTLCache(maxsize=256, ttl=REPORT_STATUS_TTL)
+        self._reports_lock = threading.Lock()
+        
+        # Content cache, loaded from SCAN_CACHE_BLOB on first use
+        self._scan_cache = None
+        self._scan_cache_updates = {}
+        self._scan_cache_lock = threading.Lock()
     
-    def _init_clients(self):
-        """Initialize Google Cloud clients with fallback authentication"""
+    @cached_property
+    def dlp_client(self):
+        """DLP API client, created on first use"""
         try:
-            # Initialize DLP client
-            self.dlp_client = dlp_v2.DlpServiceClient()
+            dlp_client = dlp_v2.DlpServiceClient()
             logger.info("DLP client initialized successfully")
+            return dlp_client
         except Exception as e:
             logger.error(f"Failed to initialize DLP client: {e}")
-            self.dlp_client = None
-        
+            return None
+    
+    @cached_property
+    def storage_client(self):
+        """Cloud Storage client, created on first use"""
         try:
-            # Initialize Storage client
-            self.storage_client = storage.Client()
+            storage_client = storage.Client()
             logger.info("Storage client initialized successfully")
+            return storage_client
         except Exception as e:
             logger.error(f"Failed to initialize Storage client: {e}")
-            self.storage_client = None
-        
-        # Initialize Drive API client
-        self.drive_service = None
-        self._init_drive_service()
+            return None
+    
+    @cached_property
+    def drive_service(self):
+        """Drive API client, created on first use"""
+        return self._init_drive_service()
     
     def _init_drive_service(self):
         """Initialize Google Drive API service with fallback authentication"""
+        drive_service = None
         try:
             # First try service account credentials
             credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
@@ -72,78 +399,56 @@ class DLPScanner:
                         logger.info("Using service account credentials")
                         credentials = service_account.Credentials.from_service_account_file(
                             credentials_path,
-                            scopes=[
-                                'https://www.googleapis.com/auth/drive',
-                                'https://www.googleapis.com/auth/drive.readonly',
-                                'https://www.googleapis.com/auth/drive.metadata.readonly',
-                                'https://www.googleapis.com/auth/drive.file'
-                            ]
+                            scopes=DRIVE_SCOPES
                         )
-                        self.drive_service = build('drive', 'v3', credentials=credentials)
+                        drive_service = self._build_drive_service(credentials)
                     # If it has OAuth client credentials format, use application default credentials
                     elif 'installed' in cred_data or 'web' in cred_data:
                         logger.info("OAuth client credentials detected, using application default credentials")
-                        credentials, project = default(scopes=[
-                            'https://www.googleapis.com/auth/drive',
-                            'https://www.googleapis.com/auth/drive.readonly',
-                            'https://www.googleapis.com/auth/drive.metadata.readonly',
-                            'https://www.googleapis.com/auth/drive.file'
-                        ])
-                        self.drive_service = build('drive', 'v3', credentials=credentials)
+                        credentials, project = _default_credentials()
+                        drive_service = self._build_drive_service(credentials)
                         logger.info(f"Authenticated as user for project: {project}")
                     else:
                         # It's application default credentials, use default auth
                         logger.info("Using application default credentials")
-                        credentials, project = default(scopes=[
-                            'https://www.googleapis.com/auth/drive',
-                            'https://www.googleapis.com/auth/drive.readonly',
-                            'https://www.googleapis.com/auth/drive.metadata.readonly',
-                            'https://www.googleapis.com/auth/drive.file'
-                        ])
-                        self.drive_service = build('drive', 'v3', credentials=credentials)
+                        credentials, project = _default_credentials()
+                        drive_service = self._build_drive_service(credentials)
                         logger.info(f"Authenticated as user for project: {project}")
                 except (json.JSONDecodeError, KeyError):
                     # If we can't parse it as JSON, try application default credentials
                     logger.info("Using application default credentials")
-                    credentials, project = default(scopes=[
-                        'https://www.googleapis.com/auth/drive',
-                        'https://www.googleapis.com/auth/drive.readonly',
-                        'https://www.googleapis.com/auth/drive.metadata.readonly',
-                        'https://www.googleapis.com/auth/drive.file'
-                    ])
-                    self.drive_service = build('drive', 'v3', credentials=credentials)
+                    credentials, project = _default_credentials()
+                    drive_service = self._build_drive_service(credentials)
                     logger.info(f"Authenticated as user for project: {project}")
             else:
                 # Fallback to user credentials (application default)
                 logger.info("Using application default credentials")
-                credentials, project = default(scopes=[
-                    'https://www.googleapis.com/auth/drive',
-                    'https://www.googleapis.com/auth/drive.readonly',
-                    'https://www.googleapis.com/auth/drive.metadata.readonly',
-                    'https://www.googleapis.com/auth/drive.file'
-                ])
-                self.drive_service = build('drive', 'v3', credentials=credentials)
+                credentials, project = _default_credentials()
+                drive_service = self._build_drive_service(credentials)
                 logger.info(f"Authenticated as user for project: {project}")
         except Exception as e:
             logger.error(f"Failed to initialize Drive service: {e}")
             logger.info("Drive service will not be available. Please set up authentication.")
+        return drive_service
+    
+    def _build_drive_service(self, credentials):
+        """Build a Drive client whose requests reuse persistent per-thread connections.
+        
+        Pool workers live for the life of the process, so Drive calls made
+        on them keep their connections; request threads don't, which is why
+        download_file_content and get_files_metadata hand their work to
+        _drive_api_pool.
+        """
+        self.drive_credentials = credentials
+        
+        def request_builder(http, *args, **kwargs):
+            return HttpRequest(self._thread_http(), *args, **kwargs)
+        
+        return build('drive', 'v3', http=self._thread_http(), requestBuilder=request_builder)
     
     def get_sensitive_info_types(self):
         """Get the list of infoTypes to scan for sensitive data"""
-        return [
-            {"name": "PERSON_NAME"},
-            {"name": "EMAIL_ADDRESS"},
-            {"name": "PHONE_NUMBER"},
-            {"name": "US_SOCIAL_SECURITY_NUMBER"},
-            {"name": "CREDIT_CARD_NUMBER"},
-            {"name": "US_DRIVERS_LICENSE_NUMBER"},
-            {"name": "US_PASSPORT"},
-            {"name": "DATE_OF_BIRTH"},
-            {"name": "MEDICAL_RECORD_NUMBER"},
-            {"name": "US_BANK_ROUTING_MICR"},
-            {"name": "IBAN_CODE"},
-            {"name": "SWIFT_CODE"}
-        ]
+        return [{"name": name} for name in _INFO_TYPES]
     
     def get_custom_info_types(self):
         """Get custom info types for company-specific sensitive data"""
@@ -270,189 +575,1075 @@ class DLPScanner:
     
     def download_file_content(self, file_id):
         """Download file content from Google Drive"""
+        return self._drive_api_pool.submit(self._download_file_content, file_id).result()
+    
+    def _download_file_content(self, file_id):
+        """Fetch a file's metadata unless cached, then download its content"""
         try:
             if not self.drive_service:
                 raise Exception("Drive service not initialized")
             
-            # Get file metadata
-            file_metadata = self.drive_service.files().get(fileId=file_id).execute()
-            file_name = file_metadata.get('name', 'unknown')
-            mime_type = file_metadata.get('mimeType', '')
+            # Get file metadata, unless it was fetched recently
+            with self._file_metadata_lock:
+                file_metadata = self._file_metadata.get(file_id)
+            if file_metadata is None:
+                file_metadata = self.drive_service.files().get(fileId=file_id, fields=DRIVE_FILE_FIELDS).execute()
+                self._remember_file_metadata({file_id: file_metadata})
             
-            # Download file content based on MIME type
-            if 'google-apps' in mime_type:
-                # Handle Google Workspace files (Docs, Sheets, Slides)
-                if 'document' in mime_type:
-                    export_mime_type = 'text/plain'
-                elif 'spreadsheet' in mime_type:
-                    export_mime_type = 'text/csv'
-                elif 'presentation' in mime_type:
-                    export_mime_type = 'text/plain'
-                else:
-                    export_mime_type = 'application/pdf'
-                
-                request = self.drive_service.files().export_media(
-                    fileId=file_id, 
-                    mimeType=export_mime_type
-                )
+            return self._download_media(file_id, file_metadata)
+            
+        except Exception as e:
+            # The cached metadata may be what's out of date, so refetch it next time
+            with self._file_metadata_lock:
+                self._file_metadata.pop(file_id, None)
+            logger.error(f"Error downloading file {file_id}: {e}")
+            raise
+    
+    def _remember_file_metadata(self, metadata):
+        """Cache File metadata by file id for later downloads"""
+        with self._file_metadata_lock:
+            self._file_metadata.update(metadata)
+    
+    def get_files_metadata(self, file_ids, fields=DRIVE_FILE_FIELDS):
+        """Fetch metadata for several files with Drive batch requests.
+        
+        Extra fields can be requested, but fields must keep DRIVE_FILE_FIELDS
+        since the results are cached for later downloads.
+        """
+        return self._drive_api_pool.submit(self._fetch_files_metadata, file_ids, fields).result()
+    
+    def _fetch_files_metadata(self, file_ids, fields=DRIVE_FILE_FIELDS):
+        """Fetch File metadata in adaptive, retried batches, returning (metadata, errors)"""
+        if not self.drive_service:
+            raise Exception("Drive service not initialized")
+        
+        metadata = {}
+        errors = {}
+        
+        def collect(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
             else:
-                # Handle regular files
-                request = self.drive_service.files().get_media(fileId=file_id)
+                metadata[request_id] = response
+        
+        # Batch request ids must be unique, so drop duplicate file ids
+        queue = list(dict.fromkeys(file_ids))
+        retries = 0
+        while queue:
+            batch_ids, queue = queue[:self._drive_batch_size], queue[self._drive_batch_size:]
+            batch = self.drive_service.new_batch_http_request(callback=collect)
+            for file_id in batch_ids:
+                batch.add(self.drive_service.files().get(fileId=file_id, fields=fields),
+                          request_id=file_id)
+            batch.execute()
             
-            file_content = request.execute()
+            throttled = [
+                file_id for file_id in batch_ids
+                if isinstance(errors.get(file_id), HttpError)
+                and errors[file_id].resp.status in DRIVE_RETRYABLE_STATUSES
+            ]
+            self._adapt_drive_batch_size(len(batch_ids) - len(throttled), bool(throttled))
             
+            if throttled and retries < DRIVE_NUM_RETRIES:
+                # Back off with jitter, then retry the throttled files in smaller batches
+                time.sleep(min(32, 2 ** retries) + random.random())
+                retries += 1
+                for file_id in throttled:
+                    del errors[file_id]
+                queue = throttled + queue
+            elif not throttled:
+                retries = 0
+        
+        self._remember_file_metadata(metadata)
+        return metadata, errors
+    
+    def _adapt_drive_batch_size(self, succeeded, throttled):
+        """Halve the metadata batch size on throttling, grow it slowly after clean batches"""
+        with self._drive_batch_lock:
+            if throttled:
+                self._drive_batch_size = max(1, self._drive_batch_size // 2)
+                self._drive_batch_successes = 0
+                logger.warning(f"Drive throttled a metadata batch, batch size now {self._drive_batch_size}")
+                return
+            
+            self._drive_batch_successes += succeeded
+            while self._drive_batch_successes >= DRIVE_BATCH_GROWTH_WINDOW:
+                self._drive_batch_successes -= DRIVE_BATCH_GROWTH_WINDOW
+                self._drive_batch_size = min(DRIVE_BATCH_SIZE_MAX, self._drive_batch_size + DRIVE_BATCH_GROWTH_STEP)
+    
+    def _thread_http(self):
+        """Get an authorized HTTP transport for the current thread.
+        
+        httplib2 connections are not thread-safe, so each worker thread
+        gets its own transport and keeps its connections alive between
+        Drive requests. build_http gives it the client library's default
+        socket timeout, so a stalled connection can't hold a worker forever.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.drive_credentials, http=build_http())
+            self._local.http = http
+        return http
+    
+    def is_scannable_mime_type(self, mime_type):
+        """Check whether files of this MIME type are worth downloading for inspection"""
+        if DLP_SCAN_MEDIA:
+            return True
+        return not (mime_type.startswith(_UNSCANNABLE_MIME_PREFIXES) or mime_type in _UNSCANNABLE_MIME_TYPES)
+    
+    def _download_media(self, file_id, file_metadata):
+        """Download the content of a file whose metadata is already known"""
+        file_name = file_metadata.get('name', 'unknown')
+        mime_type = file_metadata.get('mimeType', '')
+        
+        if not self.is_scannable_mime_type(mime_type):
+            logger.info(f"Skipping download of {file_id}: unsupported MIME type {mime_type}")
             return {
-                'content': file_content,
+                'content': b'',
                 'name': file_name,
                 'mime_type': mime_type,
-                'size': len(file_content)
+                'size': 0,
+                'skipped': True
             }
+        
+        # Download file content based on MIME type
+        if 'google-apps' in mime_type:
+            # Handle Google Workspace files (Docs, Sheets, Slides)
+            if 'document' in mime_type:
+                export_mime_type = 'text/plain'
+            elif 'spreadsheet' in mime_type:
+                export_mime_type = 'text/csv'
+            elif 'presentation' in mime_type:
+                export_mime_type = 'text/plain'
+            else:
+                export_mime_type = 'application/pdf'
             
-        except Exception as e:
-            logger.error(f"Error downloading file {file_id}: {e}")
+            request = self.drive_service.files().export_media(
+                fileId=file_id, 
+                mimeType=export_mime_type
+            )
+        elif int(file_metadata.get('size') or 0) >= DRIVE_PARALLEL_DOWNLOAD_THRESHOLD:
+            file_content, size = self._spooled_content(self._download_ranges(file_id, int(file_metadata['size'])))
+            return {
+                'content': file_content,
+                'name': file_name,
+                'mime_type': mime_type,
+                'size': size
+            }
+        else:
+            # Handle regular files
+            request = self.drive_service.files().get_media(fileId=file_id)
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=DRIVE_SPOOL_SIZE)
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=DRIVE_DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk(num_retries=DRIVE_NUM_RETRIES)
+        file_content, size = self._spooled_content(buffer)
+        
+        return {
+            'content': file_content,
+            'name': file_name,
+            'mime_type': mime_type,
+            'size': size
+        }
+    
+    def _spooled_content(self, buffer):
+        """Return downloaded content and its size.
+        
+        Content up to DRIVE_SPOOL_SIZE is returned as bytes. Anything larger
+        is returned as the open, rewound temporary file, which callers
+        release with release_content once done with it.
+        """
+        size = buffer.tell()
+        buffer.seek(0)
+        if size <= DRIVE_SPOOL_SIZE:
+            with buffer:
+                return buffer.read(), size
+        return buffer, size
+    
+    def release_content(self, file_data):
+        """Close the temporary file behind downloaded content, if any"""
+        content = file_data.get('content') if file_data else None
+        if hasattr(content, 'close'):
+            content.close()
+    
+    def _download_ranges(self, file_id, size):
+        """Download a large binary file as concurrent byte-range requests"""
+        def fetch(start):
+            # Built on the worker thread so it uses that thread's connection
+            request = self.drive_service.files().get_media(fileId=file_id)
+            # The last range is open-ended in case the file grew since its metadata was read
+            end = start + DRIVE_RANGE_SIZE - 1 if start + DRIVE_RANGE_SIZE < size else ''
+            request.headers['Range'] = f"bytes={start}-{end}"
+            # Written at its own offset as soon as it arrives, so no range waits
+            # in memory for the ones before it
+            os.pwrite(buffer.fileno(), request.execute(num_retries=DRIVE_NUM_RETRIES), start)
+        
+        buffer = tempfile.TemporaryFile()
+        try:
+            for _ in self._range_pool.map(fetch, range(0, size, DRIVE_RANGE_SIZE)):
+                pass
+        except Exception:
+            buffer.close()
             raise
+        buffer.seek(0, io.SEEK_END)
+        return buffer
+    
+    def _iter_chunks(self, content, size=DLP_CHUNK_SIZE, overlap=DLP_CHUNK_OVERLAP):
+        """Split content into overlapping chunks for inspection.
+        
+        Yields (byte_offset, chunk) pairs, where byte_offset is the position
+        of the chunk within the original content as DLP reports it.
+        Content spooled to a file is read one chunk at a time.
+        """
+        if hasattr(content, 'read'):
+            yield from self._iter_file_chunks(content, size, overlap)
+            return
+        
+        if len(content) <= size:
+            yield 0, content
+            return
+        
+        start = 0
+        byte_offset = 0
+        while True:
+            chunk = content[start:start + size]
+            yield byte_offset, chunk
+            if start + size >= len(content):
+                return
+            step = size - overlap
+            consumed = content[start:start + step]
+            byte_offset += len(consumed.encode('utf-8')) if isinstance(consumed, str) else len(consumed)
+            start += step
+    
+    def _iter_file_chunks(self, fh, size, overlap):
+        """Read overlapping (byte_offset, chunk) pairs from a binary file"""
+        start = 0
+        fh.seek(0)
+        chunk = fh.read(size)
+        while True:
+            yield start, chunk
+            if len(chunk) < size:
+                return
+            start += size - overlap
+            fh.seek(start)
+            chunk = fh.read(size)
+            # Only the overlap with the previous chunk is left
+            if len(chunk) <= overlap:
+                return
+    
+    def is_text_mime_type(self, mime_type):
+        """Check whether content of this MIME type reaches DLP as plain text"""
+        return mime_type.startswith('text/') or mime_type in _TEXT_MIME_TYPES
+    
+    def _prefilter_match(self, chunk):
+        """Check a text chunk for anything that could be a DLP finding"""
+        if isinstance(chunk, bytes):
+            return _PREFILTER_BYTES_RE.search(chunk) is not None
+        return _PREFILTER_RE.search(chunk) is not None
+    
+    def _get_inspect_config(self, include_custom_types=True, custom_patterns=None):
+        """Get the DLP InspectConfig proto, built once per distinct configuration"""
+        patterns_key = tuple(sorted(
+            (name, pattern_config['pattern'], pattern_config.get('likelihood', 'POSSIBLE'))
+            for name, pattern_config in (custom_patterns or {}).items()
+        ))
+        cache_key = (include_custom_types, patterns_key)
+        
+        # LRUCache reorders entries even on reads, so every access is locked
+        with self._inspect_configs_lock:
+            inspect_config = self._inspect_configs.get(cache_key)
+        if inspect_config is None:
+            inspect_config = self._build_inspect_config(include_custom_types, custom_patterns)
+            with self._inspect_configs_lock:
+                self._inspect_configs[cache_key] = inspect_config
+        return inspect_config
+    
+    def _build_inspect_config(self, include_custom_types=True, custom_patterns=None):
+        """Convert the DLP configuration to an InspectConfig proto"""
+        inspect_config = dlp_v2.InspectConfig(_INSPECT_CONFIG)
+        
+        # Add custom info types if enabled
+        if include_custom_types:
+            dlp_config = self.get_dlp_config(include_custom_types, custom_patterns)
+            for custom_type in dlp_config["inspectConfig"].get("customInfoTypes", []):
+                # The config describes each pattern as a hotword rule, but DLP
+                # detects custom infoTypes by matching the pattern as a regex
+                inspect_config.custom_info_types.append(dlp_v2.CustomInfoType(
+                    info_type={"name": custom_type["info_type"]["name"]},
+                    likelihood=custom_type.get("likelihood", "POSSIBLE"),
+                    regex={"pattern": custom_type["detection_rule"]["hotword_rule"]["hotword_regex"]["pattern"]}
+                ))
+        
+        return inspect_config
+    
+    def _inspect_item(self, content_item, inspect_config):
+        """Send one content item to DLP, returning its raw protobuf result"""
+        request = {
+            "parent": f"projects/{self.project_id}",
+            "inspect_config": inspect_config,
+            "item": content_item
+        }
+        response = self.dlp_client.inspect_content(request=request)
+        
+        # The raw protobuf result is read directly, since the proto-plus
+        # wrappers re-marshal every field on each attribute access
+        return dlp_v2.InspectResult.pb(response.result)
+    
+    def _finding_dict(self, finding, start, end):
+        """Convert a raw protobuf finding to the stored finding format"""
+        return {
+            "info_type": finding.info_type.name,
+            "likelihood": _LIKELIHOOD_NAMES.get(finding.likelihood, "LIKELIHOOD_UNSPECIFIED"),
+            "quote": finding.quote,
+            "location": {
+                "byte_range": {
+                    "start": start,
+                    "end": end
+                }
+            }
+        }
+    
+    def _scan_result(self, file_info, findings, custom_patterns=None, include_custom_types=True):
+        """Build the scan result document for a file"""
+        return {
+            "file_info": file_info,
+            "findings": findings,
+            "scan_timestamp": datetime.utcnow().isoformat(),
+            "total_findings": len(findings),
+            "config_used": {
+                "include_custom_types": include_custom_types,
+                "custom_patterns_count": len(custom_patterns) if custom_patterns else 0
+            }
+        }
     
     def inspect_content(self, content, file_info, custom_patterns=None, include_custom_types=True):
         """Inspect content using Google Cloud DLP API with customizable configuration"""
         try:
-            # Prepare the content item
-            if isinstance(content, bytes):
-                content_item = {
-                    "byte_item": {
-                        "type_": dlp_v2.ByteContentItem.BytesType.BYTES_TYPE_UNSPECIFIED,
-                        "data": content
-                    }
-                }
+            inspect_config = self._get_inspect_config(include_custom_types, custom_patterns)
+            
+            # Patterns sent with the request are unknown to the prefilter
+            mime_type = file_info.get('mime_type') or ''
+            prefilter = DLP_PREFILTER_ENABLED and not custom_patterns and self.is_text_mime_type(mime_type)
+            
+            # Inspect text in chunks that fit within DLP's request size limit
+            # Content spooled to disk is a file, measured without reading it
+            content_size = content.seek(0, io.SEEK_END) if hasattr(content, 'read') else len(content)
+            if isinstance(content, str) or self.is_text_mime_type(mime_type):
+                chunks = self._iter_chunks(content)
+            elif content_size > DLP_MAX_BINARY_SIZE:
+                raise ValueError(
+                    f"{file_info.get('name', 'File')} is {content_size} bytes of {mime_type or 'binary'} content, "
+                    f"over the {DLP_MAX_BINARY_SIZE} byte limit for inspecting binary files"
+                )
             else:
-                content_item = {
-                    "value": content
-                }
+                # A single chunk holding the whole file
+                chunks = self._iter_chunks(content, size=max(content_size, 1))
             
-            # Get DLP configuration
-            dlp_config = self.get_dlp_config(include_custom_types, custom_patterns)
+            findings = []
+            seen = set()
+            for offset, chunk in chunks:
+                if prefilter and not self._prefilter_match(chunk):
+                    continue
+                
+                # Prepare the content item
+                if isinstance(chunk, bytes):
+                    content_item = {
+                        "byte_item": {
+                            "type_": dlp_v2.ByteContentItem.BytesType.BYTES_TYPE_UNSPECIFIED,
+                            "data": chunk
+                        }
+                    }
+                else:
+                    content_item = {
+                        "value": chunk
+                    }
+                
+                # Process findings, shifting locations back to whole-file offsets
+                for finding in self._inspect_item(content_item, inspect_config).findings:
+                    start = finding.location.byte_range.start + offset
+                    end = finding.location.byte_range.end + offset
+                    
+                    # Chunks overlap, so the same finding can be reported twice
+                    key = (finding.info_type.name, start, end)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    
+                    findings.append(self._finding_dict(finding, start, end))
             
-            # Convert config to DLP API format
-            inspect_config = {
-                "info_types": [{"name": info_type["name"]} for info_type in dlp_config["inspectConfig"]["infoTypes"]],
-                "min_likelihood": dlp_v2.Likelihood.POSSIBLE,
-                "limits": {"max_findings_per_request": 100},
-                "include_quote": True
-            }
+            return self._scan_result(file_info, findings, custom_patterns, include_custom_types)
             
-            # Add custom info types if enabled
-            if include_custom_types and "customInfoTypes" in dlp_config["inspectConfig"]:
-                # Use the custom info types directly as they're already in the correct format
-                inspect_config["custom_info_types"] = dlp_config["inspectConfig"]["customInfoTypes"]
+        except Exception as e:
+            logger.error(f"Error inspecting content: {e}")
+            raise
+    
+    def is_packable(self, file_data):
+        """Check whether a downloaded file can share a DLP request with others"""
+        return (file_data['size'] <= DLP_PACK_FILE_SIZE and
+                not hasattr(file_data['content'], 'read') and
+                self.is_text_mime_type(file_data['mime_type']))
+    
+    def inspect_packed(self, files):
+        """Inspect several small text files with a single DLP request.
+        
+        Takes (content, file_info) pairs and returns a scan result for each,
+        in order. The contents are joined into one UTF-8 item and each
+        finding is mapped back to its file by offset.
+        """
+        try:
+            contents = [content.encode('utf-8') if isinstance(content, str) else content
+                        for content, _ in files]
+            findings = [[] for _ in files]
             
-            # Create the request
-            parent = f"projects/{self.project_id}"
-            request = {
-                "parent": parent,
-                "inspect_config": inspect_config,
-                "item": content_item
-            }
+            # Files the prefilter rules out don't need to be sent at all
+            packed = [index for index, content in enumerate(contents)
+                      if not DLP_PREFILTER_ENABLED or self._prefilter_match(content)]
             
-            # Call the DLP API
-            response = self.dlp_client.inspect_content(request=request)
+            starts = []
+            position = 0
+            for index in packed:
+                starts.append(position)
+                position += len(contents[index]) + len(DLP_PACK_DELIMITER)
             
-            # Process findings
-            findings = []
-            if response.result.findings:
-                for finding in response.result.findings:
-                    finding_dict = {
-                        "info_type": finding.info_type.name,
-                        "likelihood": finding.likelihood.name,
-                        "quote": finding.quote,
-                        "location": {
-                            "byte_range": {
-                                "start": finding.location.byte_range.start,
-                                "end": finding.location.byte_range.end
-                            }
-                        }
+            if packed:
+                result = self._inspect_item({
+                    "byte_item": {
+                        "type_": dlp_v2.ByteContentItem.BytesType.TEXT_UTF8,
+                        "data": DLP_PACK_DELIMITER.join(contents[index] for index in packed)
                     }
-                    findings.append(finding_dict)
+                }, self._get_inspect_config())
+                
+                if result.findings_truncated:
+                    # The shared findings limit was hit, so inspect the files one by one
+                    return [self.inspect_content(content, file_info) for content, file_info in files]
+                
+                for finding in result.findings:
+                    start = finding.location.byte_range.start
+                    end = finding.location.byte_range.end
+                    slot = bisect.bisect_right(starts, start) - 1
+                    index = packed[slot]
+                    
+                    # Drop matches that run across the delimiter into another file
+                    if end - starts[slot] > len(contents[index]):
+                        continue
+                    findings[index].append(self._finding_dict(finding, start - starts[slot], end - starts[slot]))
             
-            return {
-                "file_info": file_info,
-                "findings": findings,
-                "scan_timestamp": datetime.utcnow().isoformat(),
-                "total_findings": len(findings),
-                "config_used": {
-                    "include_custom_types": include_custom_types,
-                    "custom_patterns_count": len(custom_patterns) if custom_patterns else 0
-                }
-            }
+            return [self._scan_result(file_info, file_findings)
+                    for (_, file_info), file_findings in zip(files, findings)]
             
         except Exception as e:
-            logger.error(f"Error inspecting content: {e}")
+            logger.error(f"Error inspecting packed content: {e}")
             raise
     
+    def results_bucket(self, create=False):
+        """Get the scan results bucket, checking that it exists only once.
+        
+        Returns None while the bucket doesn't exist, unless create is set.
+        """
+        if self._results_bucket is not None:
+            return self._results_bucket
+        
+        with self._results_bucket_lock:
+            if self._results_bucket is None:
+                bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+                bucket = self.storage_client.bucket(bucket_name)
+                try:
+                    bucket.reload()  # This will raise an exception if bucket doesn't exist
+                except Exception:
+                    if not create:
+                        return None
+                    logger.info(f"Creating bucket: {bucket_name}")
+                    try:
+                        bucket = self.storage_client.create_bucket(bucket_name)
+                        logger.info(f"Bucket created successfully: {bucket_name}")
+                    except Conflict:
+                        # Another instance created it first
+                        bucket = self.storage_client.bucket(bucket_name)
+                self._results_bucket = bucket
+            return self._results_bucket
+    
     def store_scan_results(self, scan_results, file_id):
         """Store scan results in Cloud Storage"""
         try:
             if not self.storage_client:
                 logger.warning("Storage client not initialized, skipping result storage")
                 return None
-                
-            bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
             
-            # Try to get the bucket, create it if it doesn't exist
-            try:
-                bucket = self.storage_client.bucket(bucket_name)
-                bucket.reload()  # This will raise an exception if bucket doesn't exist
-            except Exception:
-                logger.info(f"Creating bucket: {bucket_name}")
-                bucket = self.storage_client.create_bucket(bucket_name)
-                logger.info(f"Bucket created successfully: {bucket_name}")
+            bucket = self.results_bucket(create=True)
             
             # Create a unique filename for the results
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            timestamp = _blob_timestamp(scan_results['scan_timestamp'])
             blob_name = f"scan_results/{file_id}_{timestamp}.json"
             
+            # Findings compress well; GCS clients decompress gzip-encoded objects on download
             blob = bucket.blob(blob_name)
-            blob.upload_from_string(
-                json.dumps(scan_results, indent=2),
-                content_type='application/json'
-            )
+            blob.content_encoding = 'gzip'
+            if len(scan_results.get('findings', [])) > SCAN_RESULTS_STREAM_FINDINGS:
+                self._stream_scan_results(blob, scan_results)
+            else:
+                blob.upload_from_string(
+                    gzip.compress(orjson.dumps(scan_results), compresslevel=3),
+                    content_type='application/json',
+                    timeout=GCS_UPLOAD_TIMEOUT
+                )
             
             logger.info(f"Scan results stored: {blob_name}")
+            self.invalidate_views()
             return blob_name
             
         except Exception as e:
             logger.error(f"Error storing scan results: {e}")
             raise
     
-    def move_to_vault(self, file_id, scan_results):
+    def _content_key(self, file_metadata):
+        """Identify a file's current content, or None if Drive gives no way to tell"""
+        if file_metadata.get('md5Checksum'):
+            return f"md5:{file_metadata['md5Checksum']}"
+        # Workspace files have no checksum, but their version changes with every edit
+        if file_metadata.get('version'):
+            return f"version:{file_metadata['version']}"
+        return None
+    
+    def _read_scan_cache(self):
+        """Read the content cache blob from the results bucket"""
+        try:
+            return self._download_scan_cache()[0]
+        except Exception as e:
+            logger.error(f"Error reading scan cache: {e}")
+            return {}
+    
+    def _download_scan_cache(self):
+        """Read the content cache blob and the generation it was read at, 0 if it doesn't exist"""
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        blob = self.storage_client.bucket(bucket_name).get_blob(SCAN_CACHE_BLOB)
+        if blob is None:
+            return {}, 0
+        # Pinned so the contents can't be newer than the generation returned with them
+        return orjson.loads(blob.download_as_bytes(if_generation_match=blob.generation)), blob.generation
+    
+    def get_cached_view(self, key):
+        """Return a view computed for this key within the last DASHBOARD_CACHE_TTL seconds"""
+        with self._view_cache_lock:
+            return self._view_cache.get(key)
+    
+    def cache_view(self, key, view):
+        """Keep a computed dashboard, report or latest-scan map for reuse by later requests"""
+        with self._view_cache_lock:
+            self._view_cache[key] = view
+    
+    def invalidate_views(self):
+        """Drop cached dashboards and reports, called whenever a new scan result is stored"""
+        with self._view_cache_lock:
+            self._view_cache.clear()
+    
+    def start_report(self, bucket, scan_data, cache_key):
+        """Render a PDF report in the background and store it in the results bucket, returning its id"""
+        report_id = uuid.uuid4().hex
+        filename = _report_filename()
+        
+        def render():
+            try:
+                pdf_bytes = render_scan_report(scan_data)
+                self.cache_view(cache_key, (pdf_bytes, filename))
+                blob = bucket.blob(f"{REPORT_PREFIX}{report_id}.pdf")
+                blob.metadata = {'filename': filename}
+                blob.upload_from_string(pdf_bytes, content_type='application/pdf', timeout=GCS_UPLOAD_TIMEOUT)
+                logger.info(f"Report stored: {blob.name}")
+                return pdf_bytes, filename
+            except Exception as e:
+                logger.error(f"Error generating report {report_id}: {e}")
+                raise
+        
+        with self._reports_lock:
+            self._reports[report_id] = self._report_pool.submit(render)
+        return report_id
+    
+    def report_status(self, report_id):
+        """Return ('pending' | 'failed' | 'missing' | 'ready', detail) for a background report"""
+        with self._reports_lock:
+            future = self._reports.get(report_id)
+        if future is not None:
+            if not future.done():
+                return 'pending', None
+            if future.exception():
+                return 'failed', str(future.exception())
+            return 'ready', future.result()
+        
+        # Started on another instance, or longer ago than REPORT_STATUS_TTL
+        bucket = self.results_bucket()
+        blob = bucket.get_blob(f"{REPORT_PREFIX}{report_id}.pdf") if bucket else None
+        if blob is None:
+            return 'missing', None
+        filename = (blob.metadata or {}).get('filename', f"drive_security_scan_report_{report_id}.pdf")
+        return 'ready', (blob.download_as_bytes(), filename)
+    
+    def get_cached_scan(self, file_id, file_metadata):
+        """Return the cached scan of a file if its content hasn't changed since"""
+        content_key = self._content_key(file_metadata)
+        if not content_key or not self.storage_client:
+            return None
+        
+        with self._scan_cache_lock:
+            if self._scan_cache is None:
+                self._scan_cache = self._read_scan_cache()
+            entry = self._scan_cache.get(file_id)
+        
+        if entry and entry.get('content_key') == content_key:
+            return entry
+        return None
+    
+    def remember_scan(self, file_id, file_metadata, scan_results, results_path):
+        """Record a stored scan in the content cache, written out by save_scan_cache"""
+        content_key = self._content_key(file_metadata)
+        if not content_key or not results_path:
+            return
+        
+        entry = {
+            'content_key': content_key,
+            'results_stored_at': results_path,
+            'total_findings': scan_results['total_findings'],
+            'scan_timestamp': scan_results['scan_timestamp']
+        }
+        with self._scan_cache_lock:
+            if self._scan_cache is not None:
+                self._scan_cache[file_id] = entry
+            self._scan_cache_updates[file_id] = entry
+    
+    def save_scan_cache(self):
+        """Merge new cache entries into the cache blob"""
+        with self._scan_cache_lock:
+            updates, self._scan_cache_updates = self._scan_cache_updates, {}
+        if not updates:
+            return
+        
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        for _ in range(SCAN_CACHE_SAVE_ATTEMPTS):
+            try:
+                # Other workers may have written entries since this one loaded the cache
+                cache, generation = self._download_scan_cache()
+                cache.update(updates)
+                
+                # Only written if no other worker saved in between, otherwise merge again
+                self.storage_client.bucket(bucket_name).blob(SCAN_CACHE_BLOB).upload_from_string(
+                    orjson.dumps(cache),
+                    content_type='application/json',
+                    if_generation_match=generation
+                )
+            except PreconditionFailed:
+                continue
+            except Exception as e:
+                logger.error(f"Error saving scan cache: {e}")
+                break
+            with self._scan_cache_lock:
+                self._scan_cache = {**cache, **self._scan_cache_updates}
+            return
+        else:
+            logger.error(f"Scan cache changed during {SCAN_CACHE_SAVE_ATTEMPTS} save attempts")
+        
+        # Keep the entries for the next save, behind any recorded since
+        with self._scan_cache_lock:
+            self._scan_cache_updates = {**updates, **self._scan_cache_updates}
+    
+    def scan_many(self, file_ids, use_cache=True, metadata=None, vault=True):
+        """Download, inspect and store several files as an overlapping pipeline.
+        
+        Downloads, DLP inspection and GCS uploads run on their own pools, so
+        one file is inspected while the next downloads and the previous one
+        uploads. Returns a dict mapping each file id to a future resolving to
+        (file_data, scan_results, results_path, vault_path). file_data is
+        flagged 'skipped' for files not scanned because of their MIME type,
+        and 'cached' for files whose content is unchanged since their last
+        scan, in which case scan_results is that scan's cache entry.
+        
+        Callers that already listed the files can pass their Drive metadata
+        keyed by file id to skip the metadata requests. With vault=False
+        flagged files are not copied to the vault, nor added to the content
+        cache, so a later vaulting scan still picks them up.
+        """
+        if metadata is None:
+            metadata, errors = self.get_files_metadata(file_ids)
+        else:
+            errors = {}
+        
+        outcomes = {file_id: Future() for file_id in dict.fromkeys(file_ids)}
+        for file_id, error in errors.items():
+            outcomes[file_id].set_exception(error)
+        
+        # Bounds how many downloaded files are held in memory at once
+        in_flight = threading.BoundedSemaphore(SCAN_PIPELINE_DEPTH)
+        
+        # Small text files wait here to share a DLP request. The pack is sent
+        # once full, or when no download is running that could add to it.
+        pack = []
+        pack_size = 0
+        downloading = 0
+        pack_lock = threading.Lock()
+        
+        def finish(file_id, result=None, error=None):
+            in_flight.release()
+            if error is not None:
+                logger.error(f"Error scanning file {file_id}: {error}")
+                outcomes[file_id].set_exception(error)
+            else:
+                outcomes[file_id].set_result(result)
+        
+        def persist(file_id, file_data, scan_results):
+            try:
+                results_path = self.store_scan_results(scan_results, file_id)
+                vault_path = self.move_to_vault(file_id, scan_results, file_data) if vault else None
+                # A cache hit skips vaulting, so only cache files that needed none
+                if vault or scan_results['total_findings'] == 0:
+                    self.remember_scan(file_id, metadata[file_id], scan_results, results_path)
+            except Exception as e:
+                return finish(file_id, error=e)
+            finally:
+                self.release_content(file_data)
+            finish(file_id, (file_data, scan_results, results_path, vault_path))
+        
+        def file_info(file_id, file_data):
+            return {
+                'file_id': file_id,
+                'name': file_data['name'],
+                'mime_type': file_data['mime_type'],
+                'size': file_data['size']
+            }
+        
+        def inspect(file_id, file_data):
+            try:
+                scan_results = self.inspect_content(file_data['content'], file_info(file_id, file_data))
+            except Exception as e:
+                self.release_content(file_data)
+                return finish(file_id, error=e)
+            self._io_pool.submit(persist, file_id, file_data, scan_results)
+        
+        def inspect_pack(entries):
+            try:
+                packed_results = self.inspect_packed([
+                    (file_data['content'], file_info(file_id, file_data)) for file_id, file_data in entries
+                ])
+            except Exception as e:
+                for file_id, _ in entries:
+                    finish(file_id, error=e)
+                return
+            for (file_id, file_data), scan_results in zip(entries, packed_results):
+                self._io_pool.submit(persist, file_id, file_data, scan_results)
+        
+        def download(file_id):
+            nonlocal pack, pack_size, downloading
+            try:
+                file_data = self._download_media(file_id, metadata[file_id])
+            except Exception as e:
+                file_data = None
+                finish(file_id, error=e)
+            
+            ready = []
+            with pack_lock:
+                downloading -= 1
+                packable = file_data and not file_data.get('skipped') and self.is_packable(file_data)
+                if packable:
+                    size = len(file_data['content']) + len(DLP_PACK_DELIMITER)
+                    if pack and pack_size + size > DLP_CHUNK_SIZE:
+                        ready.append(pack)
+                        pack, pack_size = [], 0
+                    pack.append((file_id, file_data))
+                    pack_size += size
+                if pack and downloading == 0:
+                    ready.append(pack)
+                    pack, pack_size = [], 0
+            for entries in ready:
+                self._inspect_pool.submit(inspect_pack, entries)
+            
+            if file_data is None or packable:
+                return
+            if file_data.get('skipped'):
+                return finish(file_id, (file_data, None, None, None))
+            self._inspect_pool.submit(inspect, file_id, file_data)
+        
+        for file_id, file_metadata in metadata.items():
+            cached = self.get_cached_scan(file_id, file_metadata) if use_cache else None
+            if cached:
+                file_data = {
+                    'name': file_metadata.get('name', 'unknown'),
+                    'mime_type': file_metadata.get('mimeType', ''),
+                    'cached': True
+                }
+                outcomes[file_id].set_result((file_data, cached, cached['results_stored_at'], None))
+                continue
+            
+            in_flight.acquire()
+            with pack_lock:
+                downloading += 1
+            self._download_pool.submit(download, file_id)
+        
+        return outcomes
+    
+    def summarize_scan(self, scan_results, results_path):
+        """Build the scan index row for a stored scan result"""
+        findings_count = scan_results.get('total_findings', 0)
+        return {
+            'file_id': scan_results.get('file_info', {}).get('file_id'),
+            'file_name': scan_results.get('file_info', {}).get('name', 'Unknown'),
+            'scan_timestamp': scan_results.get('scan_timestamp'),
+            'findings_count': findings_count,
+            'status': 'sensitive_data_found' if findings_count > 0 else 'clean',
+            'results_stored_at': results_path
+        }
+    
+    def summarize_failed_scan(self, file_id, error, file_name='Unknown'):
+        """Build the scan index row for a scan that failed before its result was stored"""
+        return {
+            'file_id': file_id,
+            'file_name': file_name,
+            'scan_timestamp': datetime.utcnow().isoformat(),
+            'findings_count': 0,
+            'status': 'error',
+            'error': str(error),
+            'results_stored_at': None
+        }
+    
+    def record_scan_summaries(self, summaries):
+        """Write scan summaries to the scan index, one NDJSON shard per SCAN_INDEX_SHARD_SIZE rows"""
+        summaries = [s for s in summaries if s.get('results_stored_at') or s.get('error')]
+        if not self.storage_client or not summaries:
+            return []
+        
+        batch_ts = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}"
+        shard_names = []
+        for shard, start in enumerate(range(0, len(summaries), SCAN_INDEX_SHARD_SIZE)):
+            try:
+                shard_names.append(self._flush_results_shard(
+                    summaries[start:start + SCAN_INDEX_SHARD_SIZE], batch_ts, shard
+                ))
+            except Exception as e:
+                # The per-file results are already stored, status falls back to them
+                logger.error(f"Error writing scan index shard {shard}: {e}")
+        
+        if shard_names:
+            # Failed scans store no result, so the index write is what changes the views
+            self.invalidate_views()
+            self.compact_scan_index()
+        return shard_names
+    
+    def _flush_results_shard(self, summaries, batch_ts, shard):
+        """Upload a bundle of scan summaries as a single NDJSON blob"""
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        bucket = self.storage_client.bucket(bucket_name)
+        
+        blob_name = f"{SCAN_INDEX_PREFIX}{batch_ts}_{shard}.ndjson"
+        bucket.blob(blob_name).upload_from_string(
+            b''.join(orjson.dumps(summary) + b'\n' for summary in summaries),
+            content_type='application/x-ndjson'
+        )
+        
+        logger.info(f"Scan index shard stored: {blob_name} ({len(summaries)} results)")
+        return blob_name
+    
+    def load_scan_summaries(self, bucket):
+        """Read every scan index shard, returning the summary rows they contain"""
+        # Keyed by results path so a rescan that overwrote a result blob shows once;
+        # failed scans have no results path and are keyed by file and time instead
+        summaries = {}
+        read = set()
+        # A shard deleted by a concurrent compaction after we listed it has
+        # already been merged, so list again once to pick up the merged shard
+        for attempt in range(2):
+            merged_away = False
+            for blob in bucket.list_blobs(prefix=SCAN_INDEX_PREFIX, fields=SCAN_RESULT_LIST_FIELDS):
+                if blob.name in read:
+                    continue
+                try:
+                    last_modified = blob.updated.isoformat() if blob.updated else None
+                    for line in blob.download_as_bytes().splitlines():
+                        if line.strip():
+                            summary = orjson.loads(line)
+                            summary['last_modified'] = last_modified
+                            key = summary['results_stored_at'] or (summary['file_id'], summary['scan_timestamp'])
+                            summaries[key] = summary
+                    read.add(blob.name)
+                except NotFound:
+                    merged_away = True
+                except Exception as e:
+                    logger.error(f"Error processing scan index shard {blob.name}: {e}")
+                    continue
+            if not merged_away:
+                break
+        return list(summaries.values())
+    
+    def load_scan_results(self, blobs):
+        """Download and parse stored scan results concurrently, yielding (blob, scan_result) in order.
+        
+        Results that can't be read are logged and skipped.
+        """
+        def load(blob):
+            try:
+                return blob, orjson.loads(blob.download_as_bytes())
+            except Exception as e:
+                logger.error(f"Error processing scan result {blob.name}: {e}")
+                return blob, None
+        
+        for blob, scan_result in self._gcs_read_pool.map(load, blobs):
+            if scan_result is not None:
+                yield blob, scan_result
+    
+    def load_all_summaries(self, bucket):
+        """Summaries of every stored scan result, for status views"""
+        # Indexed scans come from the NDJSON shards, one read per shard
+        summaries = self.load_scan_summaries(bucket)
+        indexed = {s['results_stored_at'] for s in summaries}
+        
+        # Results stored before the index existed are downloaded individually;
+        # POST /index/rebuild adds them to the index
+        summaries.extend(self.load_unindexed_summaries(bucket, indexed))
+        return summaries
+    
+    def latest_summaries(self, bucket):
+        """Map each scanned file id to its newest scan summary, cached like the dashboard"""
+        cache_key = (bucket.name, 'latest_by_file')
+        latest = self.get_cached_view(cache_key)
+        if latest is None:
+            latest = {}
+            for summary in self.load_all_summaries(bucket):
+                # Failed scans have no results path, so order attempts by their ISO timestamps
+                current = latest.get(summary['file_id'])
+                if current is None or (summary.get('scan_timestamp') or '') > (current.get('scan_timestamp') or ''):
+                    latest[summary['file_id']] = summary
+            self.cache_view(cache_key, latest)
+        return latest
+    
+    def load_unindexed_summaries(self, bucket, indexed):
+        """Summarize stored scan results missing from the index by downloading each one"""
+        # Result blobs are named scan_results/{file_id}_{timestamp}.json
+        result_name = re.compile(r"scan_results/(.+)_\d{8}_\d{6}\.json")
+        blobs = [
+            blob for blob in bucket.list_blobs(prefix="scan_results/", fields=SCAN_RESULT_LIST_FIELDS)
+            if blob.name not in indexed and result_name.fullmatch(blob.name)
+        ]
+        
+        summaries = []
+        for blob, scan_result in self.load_scan_results(blobs):
+            summary = self.summarize_scan(scan_result, blob.name)
+            summary['file_id'] = summary['file_id'] or result_name.fullmatch(blob.name).group(1)
+            summary['last_modified'] = blob.updated.isoformat() if blob.updated else None
+            summaries.append(summary)
+        return summaries
+    
+    def rebuild_scan_index(self):
+        """Index every stored scan result the index doesn't cover yet, then compact it"""
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        bucket = self.storage_client.bucket(bucket_name)
+        
+        indexed = {s['results_stored_at'] for s in self.load_scan_summaries(bucket)}
+        unindexed = self.load_unindexed_summaries(bucket, indexed)
+        for summary in unindexed:
+            del summary['last_modified']
+        self.record_scan_summaries(unindexed)
+        return len(unindexed)
+    
+    def compact_scan_index(self):
+        """Merge the oldest index shards once there are more than SCAN_INDEX_COMPACT_THRESHOLD"""
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        bucket = self.storage_client.bucket(bucket_name)
+        try:
+            shards = list(bucket.list_blobs(prefix=SCAN_INDEX_PREFIX, fields=SCAN_RESULT_LIST_FIELDS))
+        except Exception as e:
+            logger.error(f"Error listing scan index shards: {e}")
+            return
+        if len(shards) > SCAN_INDEX_COMPACT_THRESHOLD:
+            self._compact_scan_index(bucket, shards[:SCAN_INDEX_COMPACT_MAX_SOURCES])
+    
+    def _compact_scan_index(self, bucket, shards):
+        """Merge index shards into one blob server-side and delete the originals"""
+        # Named after the newest source so it sorts before any later shard,
+        # keeping newer rows winning when summaries are deduplicated
+        merged_name = shards[-1].name[:-len('.ndjson')] + '_merged.ndjson'
+        merged = bucket.blob(merged_name)
+        merged.content_type = 'application/x-ndjson'
+        try:
+            # Only one concurrent writer gets to create the merged shard
+            merged.compose(shards, if_generation_match=0)
+        except PreconditionFailed:
+            return
+        except Exception as e:
+            logger.error(f"Error compacting scan index: {e}")
+            return
+        
+        for shard in shards:
+            try:
+                shard.delete()
+            except NotFound:
+                pass
+        logger.info(f"Scan index compacted {len(shards)} shards into {merged_name}")
+    
+    def latest_scan_blob(self, bucket, file_id):
+        """Find a file's most recent scan result blob, or None if it was never scanned"""
+        # Drive ids can contain '_', so other files may share the prefix; match the full name
+        name_pattern = re.compile(rf"scan_results/{re.escape(file_id)}_\d{{8}}_\d{{6}}\.json")
+        blobs = [
+            blob for blob in bucket.list_blobs(prefix=f"scan_results/{file_id}_", fields=SCAN_RESULT_LIST_FIELDS)
+            if name_pattern.fullmatch(blob.name)
+        ]
+        
+        # Names embed a zero-padded timestamp, so the largest name is the newest
+        return max(blobs, key=lambda b: b.name, default=None)
+    
+    def _stream_scan_results(self, blob, scan_results):
+        """Upload a large scan result one finding at a time instead of as a single document"""
+        header = {key: value for key, value in scan_results.items() if key != 'findings'}
+        
+        with blob.open('wb', ignore_flush=True, content_type='application/json',
+                       timeout=GCS_UPLOAD_TIMEOUT) as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=3) as out:
+            out.write(orjson.dumps(header)[:-1] + b',"findings":[')
+            for index, finding in enumerate(scan_results['findings']):
+                if index:
+                    out.write(b',')
+                out.write(orjson.dumps(finding))
+            out.write(b']}')
+    
+    def move_to_vault(self, file_id, scan_results, file_data=None):
         """Move sensitive documents to secure vault"""
         try:
             if scan_results['total_findings'] == 0:
                 logger.info(f"No sensitive data found in {file_id}, skipping vault storage")
                 return None
             
-            # Download the original file
-            file_data = self.download_file_content(file_id)
+            # Download the original file unless the caller already has it
+            if file_data is None:
+                file_data = self.download_file_content(file_id)
             
             # Store in vault bucket
             vault_bucket_name = os.environ.get('VAULT_BUCKET', 'drive-scanner-vault')
             bucket = self.storage_client.bucket(vault_bucket_name)
             
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            timestamp = _blob_timestamp(scan_results['scan_timestamp'])
             blob_name = f"vault/{file_id}_{timestamp}_{file_data['name']}"
             
-            blob = bucket.blob(blob_name)
-            blob.upload_from_string(
-                file_data['content'] if isinstance(file_data['content'], str) else file_data['content'],
-                content_type=file_data['mime_type']
-            )
+            blob = bucket.blob(blob_name, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
             
-            # Add metadata
+            # Add metadata, sent with the upload itself
             blob.metadata = {
                 'original_file_id': file_id,
                 'scan_timestamp': scan_results['scan_timestamp'],
                 'findings_count': str(scan_results['total_findings']),
                 'file_name': file_data['name']
             }
-            blob.patch()
+            if hasattr(file_data['content'], 'read'):
+                # Spooled to disk, so upload straight from the temporary file
+                blob.upload_from_file(
+                    file_data['content'],
+                    rewind=True,
+                    size=file_data['size'],
+                    content_type=file_data['mime_type'],
+                    timeout=GCS_UPLOAD_TIMEOUT
+                )
+            else:
+                blob.upload_from_string(
+                    file_data['content'] if isinstance(file_data['content'], str) else file_data['content'],
+                    content_type=file_data['mime_type'],
+                    timeout=GCS_UPLOAD_TIMEOUT
+                )
             
             logger.info(f"File moved to vault: {blob_name}")
             return blob_name
@@ -474,24 +1665,43 @@ def scan_file():
         if not file_id:
             return jsonify({'error': 'file_id is required'}), 400
         
-        # Download file content
-        logger.info(f"Downloading file: {file_id}")
-        file_data = scanner.download_file_content(file_id)
-        
-        # Inspect content for sensitive data
-        logger.info(f"Inspecting file: {file_data['name']}")
-        scan_results = scanner.inspect_content(file_data['content'], {
-            'file_id': file_id,
-            'name': file_data['name'],
-            'mime_type': file_data['mime_type'],
-            'size': file_data['size']
-        })
-        
-        # Store scan results
-        results_path = scanner.store_scan_results(scan_results, file_id)
+        try:
+            # Download file content
+            logger.info(f"Downloading file: {file_id}")
+            file_data = scanner.download_file_content(file_id)
+            
+            if file_data.get('skipped'):
+                return jsonify({
+                    'status': 'skipped',
+                    'file_id': file_id,
+                    'file_name': file_data['name'],
+                    'findings_count': 0,
+                    'reason': f"Unsupported MIME type: {file_data['mime_type']}"
+                })
+            
+            try:
+                # Inspect content for sensitive data
+                logger.info(f"Inspecting file: {file_data['name']}")
+                scan_results = scanner.inspect_content(file_data['content'], {
+                    'file_id': file_id,
+                    'name': file_data['name'],
+                    'mime_type': file_data['mime_type'],
+                    'size': file_data['size']
+                })
+                
+                # Store scan results
+                results_path = scanner.store_scan_results(scan_results, file_id)
+                
+                # Move to vault if sensitive data found
+                vault_path = scanner.move_to_vault(file_id, scan_results, file_data)
+            finally:
+                scanner.release_content(file_data)
+        except Exception as e:
+            # Index the failure so the dashboard's success rate counts it
+            scanner.record_scan_summaries([scanner.summarize_failed_scan(file_id, e)])
+            raise
         
-        # Move to vault if sensitive data found
-        vault_path = scanner.move_to_vault(file_id, scan_results)
+        scanner.record_scan_summaries([scanner.summarize_scan(scan_results, results_path)])
         
         response = {
             'status': 'success',
@@ -518,25 +1728,40 @@ def scan_batch():
     try:
         data = request.get_json()
         file_ids = data.get('file_ids', [])
+        force_rescan = data.get('force_rescan', False)
         
         if not file_ids:
             return jsonify({'error': 'file_ids array is required'}), 400
         
+        # Download, inspect and store the files as a pipeline, skipping unchanged files
+        outcomes = scanner.scan_many(file_ids, use_cache=not force_rescan)
+        
         results = []
+        summaries = []
         for file_id in file_ids:
             try:
-                # Download and scan each file
-                file_data = scanner.download_file_content(file_id)
-                scan_results = scanner.inspect_content(file_data['content'], {
-                    'file_id': file_id,
-                    'name': file_data['name'],
-                    'mime_type': file_data['mime_type'],
-                    'size': file_data['size']
-                })
-                
-                # Store results and move to vault if needed
-                results_path = scanner.store_scan_results(scan_results, file_id)
-                vault_path = scanner.move_to_vault(file_id, scan_results)
+                file_data, scan_results, results_path, vault_path = outcomes[file_id].result()
+                if file_data.get('cached'):
+                    results.append({
+                        'file_id': file_id,
+                        'file_name': file_data['name'],
+                        'findings_count': scan_results['total_findings'],
+                        'results_stored_at': results_path,
+                        'vault_path': None,
+                        'status': 'success',
+                        'cached': True
+                    })
+                    continue
+                if file_data.get('skipped'):
+                    results.append({
+                        'file_id': file_id,
+                        'file_name': file_data['name'],
+                        'findings_count': 0,
+                        'status': 'skipped',
+                        'reason': f"Unsupported MIME type: {file_data['mime_type']}"
+                    })
+                    continue
+                summaries.append(scanner.summarize_scan(scan_results, results_path))
                 
                 results.append({
                     'file_id': file_id,
@@ -549,12 +1774,17 @@ def scan_batch():
                 
             except Exception as e:
                 logger.error(f"Error scanning file {file_id}: {e}")
+                summaries.append(scanner.summarize_failed_scan(file_id, e))
                 results.append({
                     'file_id': file_id,
                     'status': 'error',
                     'error': str(e)
                 })
         
+        # Index the whole batch in a few shard writes rather than one per file
+        scanner.record_scan_summaries(summaries)
+        scanner.save_scan_cache()
+        
         return jsonify({
             'status': 'completed',
             'total_files': len(file_ids),
@@ -572,18 +1802,18 @@ def get_scan_results(file_id):
         bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
         bucket = scanner.storage_client.bucket(bucket_name)
         
-        # List blobs with the file_id prefix
-        blobs = list(bucket.list_blobs(prefix=f"scan_results/{file_id}_"))
+        # Get the most recent result, already stored as JSON so no need to reparse it
+        latest_blob = scanner.latest_scan_blob(bucket, file_id)
         
-        if not blobs:
+        if not latest_blob:
             return jsonify({'error': 'No scan results found for this file'}), 404
         
-        # Get the most recent result
-        latest_blob = max(blobs, key=lambda b: b.time_created)
-        content = latest_blob.download_as_text()
-        scan_results = json.loads(content)
+        content = latest_blob.download_as_bytes()
         
-        return jsonify(scan_results)
+        if request.args.get('pretty', 'false').lower() in ('1', 'true'):
+            content = json.dumps(orjson.loads(content), indent=2)
+        
+        return Response(content, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error getting scan results: {e}")
@@ -593,14 +1823,14 @@ def get_scan_results(file_id):
 def get_scan_status():
     """Get scan status for all files"""
     try:
-        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
-        
-        # Try to get the bucket, return empty results if it doesn't exist
+        # Get the bucket, return empty results if it doesn't exist
         try:
-            bucket = scanner.storage_client.bucket(bucket_name)
-            bucket.reload()  # This will raise an exception if bucket doesn't exist
-        except Exception:
-            logger.info(f"Bucket {bucket_name} does not exist yet, returning empty results")
+            bucket = scanner.results_bucket()
+        except Exception as e:
+            logger.error(f"Failed to check scan results bucket: {e}")
+            bucket = None
+        if bucket is None:
+            logger.info(f"Scan results bucket does not exist yet, returning empty results")
             return jsonify({
                 'status': 'success',
                 'statistics': {
@@ -611,52 +1841,20 @@ def get_scan_status():
                 'scan_results': []
             })
         
-        # List all scan result blobs
-        blobs = list(bucket.list_blobs(prefix="scan_results/"))
-        
-        scan_status = []
-        for blob in blobs:
-            try:
-                # Extract file_id from blob name (format: scan_results/{file_id}_{timestamp}.json)
-                blob_name = blob.name
-                if blob_name.startswith("scan_results/") and blob_name.endswith(".json"):
-                    # Extract file_id from the blob name
-                    parts = blob_name.replace("scan_results/", "").replace(".json", "").split("_")
-                    if len(parts) >= 2:
-                        file_id = parts[0]
-                        timestamp = "_".join(parts[1:])
-                        
-                        # Download and parse the scan result
-                        content = blob.download_as_text()
-                        scan_result = json.loads(content)
-                        
-                        scan_status.append({
-                            'file_id': file_id,
-                            'file_name': scan_result.get('file_info', {}).get('name', 'Unknown'),
-                            'scan_timestamp': scan_result.get('scan_timestamp'),
-                            'findings_count': scan_result.get('total_findings', 0),
-                            'status': 'sensitive_data_found' if scan_result.get('total_findings', 0) > 0 else 'clean',
-                            'results_stored_at': blob_name,
-                            'last_modified': blob.updated.isoformat() if blob.updated else None
-                        })
-            except Exception as e:
-                logger.error(f"Error processing scan result {blob.name}: {e}")
-                continue
+        scan_status = scanner.load_all_summaries(bucket)
         
         # Sort by scan timestamp (most recent first)
         scan_status.sort(key=lambda x: x.get('scan_timestamp', ''), reverse=True)
         
         # Calculate statistics
-        total_scanned = len(scan_status)
-        files_with_findings = len([s for s in scan_status if s['findings_count'] > 0])
-        clean_files = total_scanned - files_with_findings
+        stats = scan_statistics(scan_status)
         
         return jsonify({
             'status': 'success',
             'statistics': {
-                'total_files_scanned': total_scanned,
-                'files_with_sensitive_data': files_with_findings,
-                'clean_files': clean_files
+                'total_files_scanned': stats['total'],
+                'files_with_sensitive_data': stats['files_with_findings'],
+                'clean_files': stats['clean_files']
             },
             'scan_results': scan_status
         })
@@ -672,20 +1870,17 @@ def get_file_scan_status(file_id):
         bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
         bucket = scanner.storage_client.bucket(bucket_name)
         
-        # List blobs with the file_id prefix
-        blobs = list(bucket.list_blobs(prefix=f"scan_results/{file_id}_"))
+        # Get the most recent result
+        latest_blob = scanner.latest_scan_blob(bucket, file_id)
         
-        if not blobs:
+        if not latest_blob:
             return jsonify({
                 'file_id': file_id,
                 'status': 'not_scanned',
                 'message': 'This file has not been scanned yet'
             })
         
-        # Get the most recent result
-        latest_blob = max(blobs, key=lambda b: b.time_created)
-        content = latest_blob.download_as_text()
-        scan_result = json.loads(content)
+        scan_result = orjson.loads(latest_blob.download_as_bytes())
         
         return jsonify({
             'file_id': file_id,
@@ -702,18 +1897,32 @@ def get_file_scan_status(file_id):
         logger.error(f"Error getting file scan status: {e}")
         return jsonify({'error': str(e)}), 500
 
+@dlp_bp.route('/index/rebuild', methods=['POST'])
+def rebuild_scan_index():
+    """Add stored scan results missing from the scan index, so status no longer downloads them"""
+    try:
+        indexed = scanner.rebuild_scan_index()
+        return jsonify({
+            'status': 'success',
+            'indexed_results': indexed
+        })
+        
+    except Exception as e:
+        logger.error(f"Error rebuilding scan index: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @dlp_bp.route('/dashboard', methods=['GET'])
 def get_scan_dashboard():
     """Get comprehensive scan dashboard with statistics and recent activity"""
     try:
-        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
-        
-        # Try to get the bucket, return empty dashboard if it doesn't exist
+        # Get the bucket, return empty dashboard if it doesn't exist
         try:
-            bucket = scanner.storage_client.bucket(bucket_name)
-            bucket.reload()  # This will raise an exception if bucket doesn't exist
-        except Exception:
-            logger.info(f"Bucket {bucket_name} does not exist yet, returning empty dashboard")
+            bucket = scanner.results_bucket()
+        except Exception as e:
+            logger.error(f"Failed to check scan results bucket: {e}")
+            bucket = None
+        if bucket is None:
+            logger.info(f"Scan results bucket does not exist yet, returning empty dashboard")
             return jsonify({
                 'status': 'success',
                 'dashboard': {
@@ -721,7 +1930,8 @@ def get_scan_dashboard():
                         'total_files_scanned': 0,
                         'files_with_sensitive_data': 0,
                         'clean_files': 0,
-                        'scan_success_rate': 0
+                        'scan_success_rate': 0,
+                        'clean_file_rate': 0
                     },
                     'recent_activity': {
                         'scans_last_7_days': 0,
@@ -737,158 +1947,89 @@ def get_scan_dashboard():
                 }
             })
         
-        # List all scan result blobs
-        blobs = list(bucket.list_blobs(prefix="scan_results/"))
+        # Serve a recently computed dashboard unless the caller asks for a fresh one
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        dashboard = None if refresh else scanner.get_cached_view((bucket.name, 'dashboard'))
+        if dashboard is not None:
+            return jsonify({'status': 'success', 'dashboard': dashboard})
         
-        scan_data = []
-        for blob in blobs:
-            try:
-                content = blob.download_as_text()
-                scan_result = json.loads(content)
-                
-                scan_data.append({
-                    'file_id': scan_result.get('file_info', {}).get('file_id'),
-                    'file_name': scan_result.get('file_info', {}).get('name', 'Unknown'),
-                    'scan_timestamp': scan_result.get('scan_timestamp'),
-                    'findings_count': scan_result.get('total_findings', 0),
-                    'status': 'sensitive_data_found' if scan_result.get('total_findings', 0) > 0 else 'clean',
-                    'last_modified': blob.updated.isoformat() if blob.updated else None
-                })
-            except Exception as e:
-                logger.error(f"Error processing scan result {blob.name}: {e}")
-                continue
+        # Aggregated from the scan index rather than from every stored result
+        scan_data = scanner.load_all_summaries(bucket)
         
         # Calculate comprehensive statistics
-        total_scanned = len(scan_data)
-        files_with_findings = len([s for s in scan_data if s['findings_count'] > 0])
-        clean_files = total_scanned - files_with_findings
-        
-        # Get recent activity (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_scans = [s for s in scan_data if s.get('scan_timestamp') and 
-                       datetime.fromisoformat(s['scan_timestamp'].replace('Z', '+00:00')) > week_ago]
+        week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+        stats = scan_statistics(scan_data, since=week_ago)
+        total_scanned = stats['total']
+        total_findings = stats['total_findings']
         
         # Get files with most findings
-        files_with_most_findings = sorted(scan_data, key=lambda x: x['findings_count'], reverse=True)[:5]
+        files_with_most_findings = heapq.nlargest(5, scan_data, key=lambda x: x['findings_count'])
         
         # Get recent scans (last 10)
-        recent_activity = sorted(scan_data, key=lambda x: x.get('scan_timestamp', ''), reverse=True)[:10]
+        recent_activity = heapq.nlargest(10, scan_data, key=lambda x: x.get('scan_timestamp', ''))
         
-        return jsonify({
-            'status': 'success',
-            'dashboard': {
-                'overview': {
-                    'total_files_scanned': total_scanned,
-                    'files_with_sensitive_data': files_with_findings,
-                    'clean_files': clean_files,
-                    'scan_success_rate': round((total_scanned - files_with_findings) / total_scanned * 100, 2) if total_scanned > 0 else 0
-                },
-                'recent_activity': {
-                    'scans_last_7_days': len(recent_scans),
-                    'recent_scans': recent_activity
-                },
-                'top_concerns': {
-                    'files_with_most_findings': files_with_most_findings
-                },
-                'scan_trends': {
-                    'total_findings': sum(s['findings_count'] for s in scan_data),
-                    'average_findings_per_file': round(sum(s['findings_count'] for s in scan_data) / total_scanned, 2) if total_scanned > 0 else 0
-                }
+        dashboard = {
+            'overview': {
+                'total_files_scanned': total_scanned,
+                'files_with_sensitive_data': stats['files_with_findings'],
+                'clean_files': stats['clean_files'],
+                'scan_success_rate': stats['scan_success_rate'],
+                'clean_file_rate': stats['clean_file_rate']
+            },
+            'recent_activity': {
+                'scans_last_7_days': stats['recent_scans'],
+                'recent_scans': recent_activity
+            },
+            'top_concerns': {
+                'files_with_most_findings': files_with_most_findings
+            },
+            'scan_trends': {
+                'total_findings': total_findings,
+                'average_findings_per_file': round(total_findings / total_scanned, 2) if total_scanned > 0 else 0
             }
-        })
+        }
+        
+        scanner.cache_view((bucket.name, 'dashboard'), dashboard)
+        
+        return jsonify({'status': 'success', 'dashboard': dashboard})
         
     except Exception as e:
         logger.error(f"Error getting scan dashboard: {e}")
         return jsonify({'error': str(e)}), 500
 
-@dlp_bp.route('/report/generate', methods=['POST'])
-def generate_scan_report():
-    """Generate a comprehensive PDF scan report"""
-    try:
-        data = request.get_json() or {}
-        report_type = data.get('type', 'comprehensive')  # comprehensive, summary, detailed
-        include_findings = data.get('include_findings', True)
-        
-        # Get scan data directly from storage
-        try:
-            bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
-            bucket = scanner.storage_client.bucket(bucket_name)
-            
-            # Get all scan result files
-            blobs = bucket.list_blobs(prefix='scan_results/')
-            scan_data = []
-            
-            for blob in blobs:
-                if blob.name.endswith('.json'):
-                    try:
-                        content = blob.download_as_text()
-                        scan_result = json.loads(content)
-                        scan_data.append(scan_result)
-                    except Exception as e:
-                        logger.warning(f"Error reading scan result {blob.name}: {e}")
-                        continue
-            
-            if not scan_data:
-                return jsonify({'error': 'No scan data available'}), 404
-            
-            # Calculate statistics
-            total_files = len(scan_data)
-            files_with_findings = len([s for s in scan_data if s.get('total_findings', 0) > 0])
-            clean_files = total_files - files_with_findings
-            total_findings = sum(s.get('total_findings', 0) for s in scan_data)
-            
-            # Sort by scan timestamp
-            scan_data.sort(key=lambda x: x.get('scan_timestamp', ''), reverse=True)
-            
-        except Exception as e:
-            logger.error(f"Error retrieving scan data: {e}")
-            return jsonify({'error': 'Unable to retrieve scan data'}), 500
-        
-        # Create PDF report
-        pdf_buffer = io.BytesIO()
-        doc = SimpleDocTemplate(pdf_buffer, pagesize=A4)
-        story = []
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
+# Status cell text for the report's recent activity rows
+_REPORT_STATUS_SENSITIVE = "⚠️ sensitive_data_found"
+_REPORT_STATUS_CLEAN = "✅ clean"
+_REPORT_STATUS_ERROR = "❌ error"
+
+@lru_cache(maxsize=1)
+def _report_styles():
+    """Paragraph and table styles for the PDF report, built on first use and shared after"""
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=24,
             spaceAfter=30,
             alignment=TA_CENTER,
             textColor=colors.darkblue
-        )
-        heading_style = ParagraphStyle(
+        ),
+        'heading': ParagraphStyle(
             'CustomHeading',
             parent=styles['Heading2'],
             fontSize=16,
             spaceAfter=12,
             spaceBefore=20,
             textColor=colors.darkblue
-        )
-        normal_style = styles['Normal']
-        
-        # Title page
-        story.append(Paragraph("Google Drive Security Scan Report", title_style))
-        story.append(Spacer(1, 20))
-        story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", normal_style))
-        story.append(Spacer(1, 30))
-        
-        # Executive Summary
-        story.append(Paragraph("Executive Summary", heading_style))
-        
-        summary_data = [
-            ['Metric', 'Value'],
-            ['Total Files Scanned', str(total_files)],
-            ['Files with Sensitive Data', str(files_with_findings)],
-            ['Clean Files', str(clean_files)],
-            ['Scan Success Rate', f"{(total_files - len([s for s in scan_data if s.get('error')])) / total_files * 100:.1f}%" if total_files > 0 else "0.0%"],
-            ['Total Findings', str(total_findings)]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[2*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([
+        ),
+        'normal': styles['Normal'],
+        'summary_table': TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -897,156 +2038,258 @@ def generate_scan_report():
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
             ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(summary_table)
-        story.append(Spacer(1, 20))
-        
-        # Risk Assessment
-        story.append(Paragraph("Risk Assessment", heading_style))
-        risk_percentage = (files_with_findings / total_files * 100) if total_files > 0 else 0
-        
-        if risk_percentage > 50:
-            risk_level = "HIGH"
-            risk_color = colors.red
-        elif risk_percentage > 25:
-            risk_level = "MEDIUM"
-            risk_color = colors.orange
-        else:
-            risk_level = "LOW"
-            risk_color = colors.green
-        
-        risk_data = [
-            ['Risk Level', 'Percentage', 'Description'],
-            [risk_level, f"{risk_percentage:.1f}%", f"{files_with_findings} out of {total_files} files contain sensitive data"]
-        ]
-        
-        risk_table = Table(risk_data, colWidths=[1.5*inch, 1*inch, 3*inch])
-        risk_table.setStyle(TableStyle([
+        ]),
+        # The risk level cell's background is added per report
+        'risk_table': TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (0, 1), risk_color),
             ('TEXTCOLOR', (0, 1), (0, 1), colors.white),
             ('FONTNAME', (0, 1), (0, 1), 'Helvetica-Bold'),
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(risk_table)
-        story.append(Spacer(1, 20))
-        
-        # Top Concerns
-        story.append(Paragraph("Top Security Concerns", heading_style))
-        
-        # Get top files with most findings
-        files_with_findings = [s for s in scan_data if s.get('total_findings', 0) > 0]
-        files_with_findings.sort(key=lambda x: x.get('total_findings', 0), reverse=True)
-        
-        if files_with_findings:
-            concerns_data = [['File Name', 'Findings', 'Scanned']]
-            for concern in files_with_findings[:10]:  # Top 10
-                scan_date = concern.get('scan_timestamp', '').split('T')[0] if concern.get('scan_timestamp') else 'Unknown'
-                file_name = concern.get('file_info', {}).get('name', 'Unknown')
-                concerns_data.append([
-                    file_name[:40] + '...' if len(file_name) > 40 else file_name,
-                    str(concern.get('total_findings', 0)),
-                    scan_date
-                ])
-            
-            concerns_table = Table(concerns_data, colWidths=[3*inch, 1*inch, 1.5*inch])
-            concerns_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
-            story.append(concerns_table)
-        else:
-            story.append(Paragraph("No high-risk files identified.", normal_style))
-        
-        story.append(Spacer(1, 20))
-        
-        # Recent Activity
-        story.append(Paragraph("Recent Scan Activity", heading_style))
-        
-        if scan_data:
-            activity_data = [['File Name', 'Status', 'Findings', 'Scanned']]
-            for activity in scan_data[:15]:  # Recent 15
-                status_icon = "⚠️" if activity.get('total_findings', 0) > 0 else "✅"
-                status_text = "sensitive_data_found" if activity.get('total_findings', 0) > 0 else "clean"
-                scan_date = activity.get('scan_timestamp', '').split('T')[0] if activity.get('scan_timestamp') else 'Unknown'
-                file_name = activity.get('file_info', {}).get('name', 'Unknown')
-                activity_data.append([
-                    file_name[:35] + '...' if len(file_name) > 35 else file_name,
-                    f"{status_icon} {status_text}",
-                    str(activity.get('total_findings', 0)),
-                    scan_date
-                ])
-            
-            activity_table = Table(activity_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1*inch])
-            activity_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 8)
-            ]))
-            story.append(activity_table)
-        else:
-            story.append(Paragraph("No recent scan activity.", normal_style))
-        
-        story.append(Spacer(1, 20))
-        
-        # Recommendations
-        story.append(Paragraph("Security Recommendations", heading_style))
-        recommendations = []
-        
-        if risk_percentage > 50:
-            recommendations.append("🔴 **HIGH PRIORITY**: Implement immediate data protection measures")
-            recommendations.append("• Review and secure files with sensitive data")
-            recommendations.append("• Implement access controls and encryption")
-            recommendations.append("• Conduct security awareness training")
-        elif risk_percentage > 25:
-            recommendations.append("🟡 **MEDIUM PRIORITY**: Enhance security posture")
-            recommendations.append("• Review files with sensitive data")
-            recommendations.append("• Implement data classification")
-            recommendations.append("• Consider encryption for sensitive files")
-        else:
-            recommendations.append("🟢 **LOW RISK**: Maintain current security practices")
-            recommendations.append("• Continue regular security monitoring")
-            recommendations.append("• Implement preventive measures")
-            recommendations.append("• Regular security assessments")
+        ]),
+        'concerns_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 9)
+        ]),
+        'activity_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8)
+        ])
+    }
+
+def render_scan_report(scan_data):
+    """Render the PDF scan report for a list of scan summaries, returning the PDF bytes"""
+    # reportlab pulls in a few hundred modules; import it here so only
+    # report generation pays for it, not every cold start.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    
+    # Calculate statistics
+    stats = scan_statistics(scan_data)
+    total_files = stats['total']
+    files_with_findings = stats['files_with_findings']
+    
+    # Create PDF report
+    pdf_buffer = io.BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4)
+    story = []
+    
+    # Get styles
+    styles = _report_styles()
+    title_style = styles['title']
+    heading_style = styles['heading']
+    normal_style = styles['normal']
+    
+    # Title page
+    story.append(Paragraph("Google Drive Security Scan Report", title_style))
+    story.append(Spacer(1, 20))
+    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", normal_style))
+    story.append(Spacer(1, 30))
+    
+    # Executive Summary
+    story.append(Paragraph("Executive Summary", heading_style))
+    
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Files Scanned', str(total_files)],
+        ['Files with Sensitive Data', str(files_with_findings)],
+        ['Clean Files', str(stats['clean_files'])],
+        ['Failed Scans', str(stats['errored'])],
+        ['Scan Success Rate', f"{stats['scan_success_rate']:.1f}%"],
+        ['Total Findings', str(stats['total_findings'])]
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[2*inch, 1.5*inch])
+    summary_table.setStyle(styles['summary_table'])
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+    
+    # Risk Assessment
+    story.append(Paragraph("Risk Assessment", heading_style))
+    risk_percentage = (files_with_findings / total_files * 100) if total_files > 0 else 0
+    
+    if risk_percentage > 50:
+        risk_level = "HIGH"
+        risk_color = colors.red
+    elif risk_percentage > 25:
+        risk_level = "MEDIUM"
+        risk_color = colors.orange
+    else:
+        risk_level = "LOW"
+        risk_color = colors.green
+    
+    risk_data = [
+        ['Risk Level', 'Percentage', 'Description'],
+        [risk_level, f"{risk_percentage:.1f}%", f"{files_with_findings} out of {total_files} files contain sensitive data"]
+    ]
+    
+    risk_table = Table(risk_data, colWidths=[1.5*inch, 1*inch, 3*inch])
+    risk_table.setStyle(TableStyle([('BACKGROUND', (0, 1), (0, 1), risk_color)], parent=styles['risk_table']))
+    story.append(risk_table)
+    story.append(Spacer(1, 20))
+    
+    # Top Concerns
+    story.append(Paragraph("Top Security Concerns", heading_style))
+    
+    # Get top files with most findings
+    files_with_findings = heapq.nlargest(
+        10,
+        (s for s in scan_data if s.get('findings_count', 0) > 0),
+        key=lambda x: x.get('findings_count', 0)
+    )
+    
+    if files_with_findings:
+        concerns_data = [['File Name', 'Findings', 'Scanned']]
+        for concern in files_with_findings:  # Top 10
+            scan_date = (concern.get('scan_timestamp') or '')[:10] or 'Unknown'
+            file_name = concern.get('file_name', 'Unknown')
+            concerns_data.append([
+                file_name[:40] + '...' if len(file_name) > 40 else file_name,
+                str(concern.get('findings_count', 0)),
+                scan_date
+            ])
+        
+        concerns_table = Table(concerns_data, colWidths=[3*inch, 1*inch, 1.5*inch])
+        concerns_table.setStyle(styles['concerns_table'])
+        story.append(concerns_table)
+    else:
+        story.append(Paragraph("No high-risk files identified.", normal_style))
+    
+    story.append(Spacer(1, 20))
+    
+    # Recent Activity
+    story.append(Paragraph("Recent Scan Activity", heading_style))
+    
+    if scan_data:
+        activity_data = [['File Name', 'Status', 'Findings', 'Scanned']]
+        for activity in heapq.nlargest(15, scan_data, key=lambda x: x.get('scan_timestamp', '')):  # Recent 15
+            scan_date = (activity.get('scan_timestamp') or '')[:10] or 'Unknown'
+            file_name = activity.get('file_name', 'Unknown')
+            activity_data.append([
+                file_name[:35] + '...' if len(file_name) > 35 else file_name,
+                _REPORT_STATUS_ERROR if activity.get('error') else
+                _REPORT_STATUS_SENSITIVE if activity.get('findings_count', 0) > 0 else _REPORT_STATUS_CLEAN,
+                str(activity.get('findings_count', 0)),
+                scan_date
+            ])
+        
+        activity_table = Table(activity_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1*inch])
+        activity_table.setStyle(styles['activity_table'])
+        story.append(activity_table)
+    else:
+        story.append(Paragraph("No recent scan activity.", normal_style))
+    
+    story.append(Spacer(1, 20))
+    
+    # Recommendations
+    story.append(Paragraph("Security Recommendations", heading_style))
+    recommendations = []
+    
+    if risk_percentage > 50:
+        recommendations.append("🔴 **HIGH PRIORITY**: Implement immediate data protection measures")
+        recommendations.append("• Review and secure files with sensitive data")
+        recommendations.append("• Implement access controls and encryption")
+        recommendations.append("• Conduct security awareness training")
+    elif risk_percentage > 25:
+        recommendations.append("🟡 **MEDIUM PRIORITY**: Enhance security posture")
+        recommendations.append("• Review files with sensitive data")
+        recommendations.append("• Implement data classification")
+        recommendations.append("• Consider encryption for sensitive files")
+    else:
+        recommendations.append("🟢 **LOW RISK**: Maintain current security practices")
+        recommendations.append("• Continue regular security monitoring")
+        recommendations.append("• Implement preventive measures")
+        recommendations.append("• Regular security assessments")
+    
+    recommendations.append("")
+    recommendations.append("**General Recommendations:**")
+    recommendations.append("• Regular security scans and monitoring")
+    recommendations.append("• Implement data loss prevention (DLP) policies")
+    recommendations.append("• Employee security training and awareness")
+    recommendations.append("• Regular backup and disaster recovery planning")
+    
+    for rec in recommendations:
+        story.append(Paragraph(rec, normal_style))
+    
+    # Build PDF
+    doc.build(story)
+    return pdf_buffer.getvalue()
+
+def _report_filename():
+    """Download name for a report rendered now"""
+    return f"drive_security_scan_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+@dlp_bp.route('/report/generate', methods=['POST'])
+def generate_scan_report():
+    """Generate a comprehensive PDF scan report.
+    
+    With "async": true the report is rendered in the background and the
+    response is 202 with a report id; GET /report/<report_id> returns it.
+    """
+    try:
+        data = request.get_json() or {}
+        report_type = data.get('type', 'comprehensive')  # comprehensive, summary, detailed
+        include_findings = data.get('include_findings', True)
+        
+        # Serve a recently rendered report unless the caller asks for a fresh one
+        bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+        cache_key = (bucket_name, 'report', str(report_type), bool(include_findings))
+        cached = None if data.get('refresh') else scanner.get_cached_view(cache_key)
+        if cached is not None:
+            pdf_bytes, filename = cached
+            return send_file(
+                io.BytesIO(pdf_bytes),
+                as_attachment=True,
+                download_name=filename,
+                mimetype='application/pdf'
+            )
         
-        recommendations.append("")
-        recommendations.append("**General Recommendations:**")
-        recommendations.append("• Regular security scans and monitoring")
-        recommendations.append("• Implement data loss prevention (DLP) policies")
-        recommendations.append("• Employee security training and awareness")
-        recommendations.append("• Regular backup and disaster recovery planning")
+        # The report only needs each file's name, findings count and scan time,
+        # so it reads the scan index summaries instead of the full results
+        try:
+            bucket = scanner.results_bucket()
+            scan_data = scanner.load_all_summaries(bucket) if bucket else []
+        except Exception as e:
+            logger.error(f"Error retrieving scan data: {e}")
+            return jsonify({'error': 'Unable to retrieve scan data'}), 500
         
-        for rec in recommendations:
-            story.append(Paragraph(rec, normal_style))
+        if not scan_data:
+            return jsonify({'error': 'No scan data available'}), 404
         
-        # Build PDF
-        doc.build(story)
-        pdf_buffer.seek(0)
+        if data.get('async'):
+            report_id = scanner.start_report(bucket, scan_data, cache_key)
+            return jsonify({
+                'status': 'accepted',
+                'report_id': report_id,
+                'report_url': f"/api/dlp/report/{report_id}"
+            }), 202
         
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"drive_security_scan_report_{timestamp}.pdf"
+        filename = _report_filename()
+        pdf_bytes = render_scan_report(scan_data)
+        scanner.cache_view(cache_key, (pdf_bytes, filename))
         
         return send_file(
-            pdf_buffer,
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
             download_name=filename,
             mimetype='application/pdf'
@@ -1056,6 +2299,33 @@ def generate_scan_report():
         logger.error(f"Error generating scan report: {e}")
         return jsonify({'error': f'Failed to generate report: {str(e)}'}), 500
 
+@dlp_bp.route('/report/<report_id>', methods=['GET'])
+def get_scan_report(report_id):
+    """Get a report started with "async": true, or 202 while it is still rendering"""
+    try:
+        if not re.fullmatch(r"[0-9a-f]{32}", report_id):
+            return jsonify({'error': 'Invalid report id'}), 400
+        
+        status, report = scanner.report_status(report_id)
+        if status == 'pending':
+            return jsonify({'status': 'pending', 'report_id': report_id}), 202
+        if status == 'failed':
+            return jsonify({'error': f'Failed to generate report: {report}'}), 500
+        if status == 'missing':
+            return jsonify({'error': 'Report not found'}), 404
+        
+        pdf_bytes, filename = report
+        return send_file(
+            io.BytesIO(pdf_bytes),
+            as_attachment=True,
+            download_name=filename,
+            mimetype='application/pdf'
+        )
+        
+    except Exception as e:
+        logger.error(f"Error getting scan report {report_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @dlp_bp.route('/config', methods=['GET'])
 def get_dlp_config():
     """Get current DLP configuration"""
@@ -1090,8 +2360,7 @@ def add_custom_pattern():
         
         # Test the pattern
         try:
-            import re
-            re.compile(pattern)
+            compile_custom_pattern(pattern)
         except re.error as e:
             return jsonify({'error': f'Invalid regex pattern: {str(e)}'}), 400
         
@@ -1115,39 +2384,33 @@ def add_custom_pattern():
         logger.error(f"Error adding custom pattern: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Standard Google DLP info types
+_AVAILABLE_STANDARD_TYPES = (
+    "PERSON_NAME", "EMAIL_ADDRESS", "PHONE_NUMBER", "US_SOCIAL_SECURITY_NUMBER",
+    "CREDIT_CARD_NUMBER", "US_DRIVERS_LICENSE_NUMBER", "US_PASSPORT", "DATE_OF_BIRTH",
+    "MEDICAL_RECORD_NUMBER", "US_BANK_ROUTING_MICR", "IBAN_CODE", "SWIFT_CODE",
+    "US_INDIVIDUAL_TAXPAYER_IDENTIFICATION_NUMBER", "US_EMPLOYER_IDENTIFICATION_NUMBER",
+    "US_ADDRESS", "US_TOLL_FREE_PHONE_NUMBER", "US_PHONE_NUMBER", "US_DRIVERS_LICENSE",
+    "US_PASSPORT_NUMBER", "US_SSN", "US_CPT_CODE", "US_HCPCS_CODE", "US_ICD9_CODE",
+    "US_ICD10_CODE", "US_NPI", "US_DEA_NUMBER", "US_NATIONAL_DRUG_CODE",
+    "US_MEDICARE_BENEFICIARY_IDENTIFIER", "US_NATIONAL_PROVIDER_IDENTIFIER"
+)
+_AVAILABLE_CUSTOM_TYPES = (
+    "CUSTOM_EMPLOYEE_ID", "CUSTOM_INTERNAL_REFERENCE", "CUSTOM_API_KEY",
+    "CUSTOM_IP_ADDRESS", "CUSTOM_DATABASE_CONNECTION"
+)
+# The /config/info-types body never changes, so it is serialized once
+_INFO_TYPES_RESPONSE = orjson.dumps({
+    'status': 'success',
+    'standard_types': _AVAILABLE_STANDARD_TYPES,
+    'custom_types': _AVAILABLE_CUSTOM_TYPES,
+    'total_types': len(_AVAILABLE_STANDARD_TYPES) + len(_AVAILABLE_CUSTOM_TYPES)
+}, option=orjson.OPT_SORT_KEYS)
+
 @dlp_bp.route('/config/info-types', methods=['GET'])
 def get_available_info_types():
     """Get list of available info types"""
-    try:
-        # Standard Google DLP info types
-        standard_types = [
-            "PERSON_NAME", "EMAIL_ADDRESS", "PHONE_NUMBER", "US_SOCIAL_SECURITY_NUMBER",
-            "CREDIT_CARD_NUMBER", "US_DRIVERS_LICENSE_NUMBER", "US_PASSPORT", "DATE_OF_BIRTH",
-            "MEDICAL_RECORD_NUMBER", "US_BANK_ROUTING_MICR", "IBAN_CODE", "SWIFT_CODE",
-            "US_INDIVIDUAL_TAXPAYER_IDENTIFICATION_NUMBER", "US_EMPLOYER_IDENTIFICATION_NUMBER",
-            "US_ADDRESS", "US_TOLL_FREE_PHONE_NUMBER", "US_PHONE_NUMBER", "US_DRIVERS_LICENSE",
-            "US_PASSPORT_NUMBER", "US_SSN", "US_CPT_CODE", "US_HCPCS_CODE", "US_ICD9_CODE",
-            "US_ICD10_CODE", "US_NPI", "US_DEA_NUMBER", "US_NATIONAL_DRUG_CODE",
-            "US_MEDICARE_BENEFICIARY_IDENTIFIER", "US_NATIONAL_PROVIDER_IDENTIFIER",
-            "US_CPT_CODE", "US_HCPCS_CODE", "US_ICD9_CODE", "US_ICD10_CODE"
-        ]
-        
-        # Custom info types
-        custom_types = [
-            "CUSTOM_EMPLOYEE_ID", "CUSTOM_INTERNAL_REFERENCE", "CUSTOM_API_KEY",
-            "CUSTOM_IP_ADDRESS", "CUSTOM_DATABASE_CONNECTION"
-        ]
-        
-        return jsonify({
-            'status': 'success',
-            'standard_types': standard_types,
-            'custom_types': custom_types,
-            'total_types': len(standard_types) + len(custom_types)
-        })
-        
-    except Exception as e:
-        logger.error(f"Error getting info types: {e}")
-        return jsonify({'error': str(e)}), 500
+    return Response(_INFO_TYPES_RESPONSE, mimetype='application/json')
 
 @dlp_bp.route('/config/sensitivity', methods=['POST'])
 def update_sensitivity_level():
@@ -1175,9 +2438,14 @@ def update_sensitivity_level():
         logger.error(f"Error updating sensitivity level: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Liveness probes hit /health constantly, so its usual body is a constant
+_HEALTH_BODY = b'{"service":"DLP Scanner","status":"healthy"}'
+
 @dlp_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (?verbose=1 adds the server time)"""
+    if not request.args.get('verbose'):
+        return Response(_HEALTH_BODY, mimetype='application/json')
     return jsonify({
         'status': 'healthy',
         'service': 'DLP Scanner',
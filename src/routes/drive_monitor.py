@@ -2,15 +2,23 @@
 Google Drive monitoring routes for detecting file changes
 """
 import os
-import json
+import orjson
 import logging
-from datetime import datetime
-from flask import Blueprint, request, jsonify
-from googleapiclient.discovery import build
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+from cachetools import TTLCache
+from flask import Blueprint, Response, request, jsonify
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest, build_http
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2 import service_account
 from google.auth import default
 from google.cloud import pubsub_v1
-import requests
+from google.api_core.exceptions import NotFound
 
 drive_bp = Blueprint('drive', __name__)
 
@@ -18,138 +26,230 @@ drive_bp = Blueprint('drive', __name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Client-side Pub/Sub batching: flush after this many messages, bytes or seconds
+PUBLISH_BATCH_MAX_MESSAGES = 1000
+PUBLISH_BATCH_MAX_BYTES = 1_000_000
+PUBLISH_BATCH_MAX_LATENCY = 0.1
+# Seconds to wait for a queued publish to be confirmed before giving up on its message id
+PUBLISH_RESULT_TIMEOUT = 30
+
+# Drive files().list page size (the API maximum) and the most pages one listing follows
+DRIVE_LIST_PAGE_SIZE = 1000
+DRIVE_LIST_MAX_PAGES = int(os.environ.get('DRIVE_LIST_MAX_PAGES', 50))
+# Fields returned per listed or changed file: what should_scan_file and scan requests read
+DRIVE_LIST_FILE_FIELDS = "id, name, mimeType, size, modifiedTime, owners(emailAddress)"
+DRIVE_LIST_FIELDS = f"nextPageToken, files({DRIVE_LIST_FILE_FIELDS})"
+# Full metadata for the single-file detail view
+DRIVE_DETAIL_FIELDS = "id, name, mimeType, size, modifiedTime, owners, parents, permissions"
+# Fields batch-fetched for trigger_scan: the scanner's cached download fields plus those a scan request carries
+SCAN_REQUEST_FILE_FIELDS = 'id,name,mimeType,size,md5Checksum,version,modifiedTime,owners(emailAddress)'
+
+# MIME types eligible for scanning
+SUPPORTED_MIME_TYPES = frozenset({
+    'application/pdf',
+    'text/plain',
+    'text/csv',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'application/vnd.google-apps.document',
+    'application/vnd.google-apps.spreadsheet',
+    'application/vnd.google-apps.presentation',
+    'application/rtf',
+    'text/html'
+})
+# Drive query clause matching only supported MIME types, so scan listings skip the rest server-side
+SUPPORTED_MIME_TYPES_QUERY = " or ".join(f"mimeType='{mime_type}'" for mime_type in sorted(SUPPORTED_MIME_TYPES))
+# Name prefixes of system and temporary files, which are never scanned
+SYSTEM_FILE_PREFIXES = ('.', '~')
+# Largest file scanned (10MB DLP API limit)
+MAX_SCAN_FILE_SIZE = 10 * 1024 * 1024
+# Seconds the change worker gathers webhook notifications into one changes sweep
+WEBHOOK_COALESCE_WINDOW = 0.1
+# Notifications waiting for the change worker; more can be dropped, as a pending sweep covers them
+WEBHOOK_QUEUE_SIZE = 1000
+# Seconds a file version's scan request is remembered, so repeats reuse it instead of publishing again
+SCAN_REQUEST_DEDUP_TTL = int(os.environ.get('SCAN_REQUEST_DEDUP_TTL', 300))
+# Most scan requests remembered for deduplication
+SCAN_REQUEST_DEDUP_SIZE = 100_000
+# Seconds the detail view reuses a file's Drive metadata, and how many files it remembers
+FILE_METADATA_TTL = 30
+FILE_METADATA_CACHE_SIZE = 10_000
+# Results bucket object holding the Drive changes page token the next sweep starts from
+CHANGES_PAGE_TOKEN_BLOB = 'drive_changes/page_token'
+# Changes fetched per changes().list page (the API maximum)
+CHANGES_PAGE_SIZE = 1000
+# Scopes requested for every Drive client the monitor builds
+DRIVE_SCOPES = (
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/drive.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+    'https://www.googleapis.com/auth/drive.file'
+)
+
+@lru_cache(maxsize=8)
+def _parse_credentials_file(path, mtime):
+    """Parse a credentials file, once per path and modification time"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def load_credentials_file(path):
+    """Get the parsed contents of a credentials file, rereading it only after it changes"""
+    return _parse_credentials_file(path, os.path.getmtime(path))
+
+@lru_cache(maxsize=1)
+def _drive_discovery_document():
+    """The Drive v3 discovery document bundled with googleapiclient, read once per process"""
+    return get_static_doc('drive', 'v3')
+
+def build_drive_service(credentials):
+    """Build a Drive v3 client whose requests reuse a persistent transport per thread.
+    
+    httplib2 connections are not thread-safe, and the monitor's client is
+    shared by request threads and the change worker, so each thread gets
+    its own keep-alive transport with the client library's default timeout.
+    The bundled discovery document is read from disk only once.
+    """
+    local = threading.local()
+    
+    def thread_http():
+        http = getattr(local, 'http', None)
+        if http is None:
+            http = local.http = AuthorizedHttp(credentials, http=build_http())
+        return http
+    
+    def request_builder(http, *args, **kwargs):
+        return HttpRequest(thread_http(), *args, **kwargs)
+    
+    document = _drive_discovery_document()
+    if document is None:
+        return build('drive', 'v3', http=thread_http(), requestBuilder=request_builder)
+    # build_from_document adjusts the parsed document, so each client gets its own copy
+    return build_from_document(orjson.loads(document), http=thread_http(), requestBuilder=request_builder)
+
+def _credential_kind(cred_data):
+    """Classify a parsed credentials file as 'service_account', 'oauth_client' or 'adc'"""
+    if not isinstance(cred_data, dict):
+        return 'adc'
+    if cred_data.get('type') == 'service_account':
+        return 'service_account'
+    if 'installed' in cred_data or 'web' in cred_data:
+        return 'oauth_client'
+    return 'adc'
+
+def _service_account_drive_service(cred_data, target_user=None):
+    """Build a Drive client from service account info, impersonating target_user if given"""
+    logger.info("Using service account credentials")
+    base_credentials = service_account.Credentials.from_service_account_info(cred_data, scopes=DRIVE_SCOPES)
+    if not target_user:
+        # Use service account directly (for admin operations)
+        logger.info("Using service account directly")
+        return build_drive_service(base_credentials)
+    
+    from google.auth import impersonated_credentials
+    target_credentials = impersonated_credentials.Credentials(
+        source_credentials=base_credentials,
+        target_principal=target_user,
+        target_scopes=DRIVE_SCOPES
+    )
+    logger.info(f"Impersonating user: {target_user}")
+    return build_drive_service(target_credentials)
+
+def _default_drive_service(cred_data=None, target_user=None):
+    """Build a Drive client from application default credentials"""
+    logger.info("Using application default credentials")
+    credentials, project = default(scopes=DRIVE_SCOPES)
+    drive_service = build_drive_service(credentials)
+    logger.info(f"Authenticated as user for project: {project}")
+    return drive_service
+
+def _oauth_client_drive_service(cred_data=None, target_user=None):
+    """OAuth client files can't authenticate on their own, so use application default credentials"""
+    logger.info("OAuth client credentials detected, using application default credentials")
+    return _default_drive_service()
+
+# Drive client factory for each kind of credentials file
+DRIVE_SERVICE_FACTORIES = {
+    'service_account': _service_account_drive_service,
+    'oauth_client': _oauth_client_drive_service,
+    'adc': _default_drive_service,
+}
+
 class DriveMonitor:
-    def __init__(self):
-        self.drive_service = None
-        self.publisher = None
+    def __init__(self, target_user=None):
+        # Drive user impersonated by drive_service, or None for the service account itself
+        self.target_user = target_user
         self.project_id = os.environ.get('GOOGLE_CLOUD_PROJECT')
         self.topic_name = os.environ.get('SCAN_REQUEST_TOPIC', 'drive-scan-requests')
-        self.topic_path = None
-        
-        self._init_clients()
-        self._init_drive_service()
+        # Push notifications waiting for the change worker, started on first use
+        self._notifications = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        self._change_worker = None
+        self._change_worker_lock = threading.Lock()
+        # Where the next changes sweep starts, loaded from the results bucket on first use
+        self.page_token = None
+        # Publish futures of recent scan requests by (file id, modified time)
+        self._recent_requests = TTLCache(maxsize=SCAN_REQUEST_DEDUP_SIZE, ttl=SCAN_REQUEST_DEDUP_TTL)
+        self._recent_requests_lock = threading.Lock()
+        # Detail metadata by file id, dropped when the changes feed reports the file
+        self._file_metadata = TTLCache(maxsize=FILE_METADATA_CACHE_SIZE, ttl=FILE_METADATA_TTL)
+        self._file_metadata_lock = threading.Lock()
     
-    def _init_clients(self):
-        """Initialize Google Cloud clients with fallback authentication"""
+    @cached_property
+    def publisher(self):
+        """Batching Pub/Sub publisher, created on first use"""
         try:
-            # Initialize PubSub client
-            self.publisher = pubsub_v1.PublisherClient()
-            self.topic_path = self.publisher.topic_path(self.project_id, self.topic_name)
+            publisher = pubsub_v1.PublisherClient(
+                batch_settings=pubsub_v1.types.BatchSettings(
+                    max_messages=PUBLISH_BATCH_MAX_MESSAGES,
+                    max_bytes=PUBLISH_BATCH_MAX_BYTES,
+                    max_latency=PUBLISH_BATCH_MAX_LATENCY
+                )
+            )
             logger.info("PubSub client initialized successfully")
+            return publisher
         except Exception as e:
             logger.error(f"Failed to initialize PubSub client: {e}")
-            self.publisher = None
-            self.topic_path = None
+            return None
+    
+    @cached_property
+    def topic_path(self):
+        """Scan request topic path, or None without a publisher"""
+        if not self.publisher:
+            return None
+        return self.publisher.topic_path(self.project_id, self.topic_name)
     
-    def _init_drive_service(self, target_user=None):
-        """Initialize Google Drive API service with user impersonation"""
+    @cached_property
+    def drive_service(self):
+        """Drive API client, created on first use"""
+        return self._init_drive_service()
+    
+    def _init_drive_service(self):
+        """Initialize Google Drive API service, impersonating target_user if set"""
+        drive_service = None
         try:
-            # First try service account credentials
+            # Service account files are used directly; anything else falls back to application default credentials
             credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+            cred_data = None
+            kind = 'adc'
             if credentials_path and os.path.exists(credentials_path):
-                # Check if it's a service account file, OAuth client credentials, or application default credentials
                 try:
-                    with open(credentials_path, 'r') as f:
-                        cred_data = json.load(f)
-                    
-                    # If it has service account fields, use service account auth
-                    if 'type' in cred_data and cred_data['type'] == 'service_account':
-                        logger.info("Using service account credentials")
-                        base_credentials = service_account.Credentials.from_service_account_file(
-                            credentials_path,
-                            scopes=[
-                                'https://www.googleapis.com/auth/drive',
-                                'https://www.googleapis.com/auth/drive.readonly',
-                                'https://www.googleapis.com/auth/drive.metadata.readonly',
-                                'https://www.googleapis.com/auth/drive.file'
-                            ]
-                        )
-                        
-                        # If target user is specified, impersonate that user
-                        if target_user:
-                            from google.auth import impersonated_credentials
-                            target_credentials = impersonated_credentials.Credentials(
-                                source_credentials=base_credentials,
-                                target_principal=target_user,
-                                target_scopes=[
-                                    'https://www.googleapis.com/auth/drive',
-                                    'https://www.googleapis.com/auth/drive.readonly',
-                                    'https://www.googleapis.com/auth/drive.metadata.readonly',
-                                    'https://www.googleapis.com/auth/drive.file'
-                                ]
-                            )
-                            self.drive_service = build('drive', 'v3', credentials=target_credentials)
-                            logger.info(f"Impersonating user: {target_user}")
-                        else:
-                            # Use service account directly (for admin operations)
-                            self.drive_service = build('drive', 'v3', credentials=base_credentials)
-                            logger.info("Using service account directly")
-                    # If it has OAuth client credentials format, use application default credentials
-                    elif 'installed' in cred_data or 'web' in cred_data:
-                        logger.info("OAuth client credentials detected, using application default credentials")
-                        credentials, project = default(scopes=[
-                            'https://www.googleapis.com/auth/drive',
-                            'https://www.googleapis.com/auth/drive.readonly',
-                            'https://www.googleapis.com/auth/drive.metadata.readonly',
-                            'https://www.googleapis.com/auth/drive.file'
-                        ])
-                        self.drive_service = build('drive', 'v3', credentials=credentials)
-                        logger.info(f"Authenticated as user for project: {project}")
-                    else:
-                        # It's application default credentials, use default auth
-                        logger.info("Using application default credentials")
-                        credentials, project = default(scopes=[
-                            'https://www.googleapis.com/auth/drive',
-                            'https://www.googleapis.com/auth/drive.readonly',
-                            'https://www.googleapis.com/auth/drive.metadata.readonly',
-                            'https://www.googleapis.com/auth/drive.file'
-                        ])
-                        self.drive_service = build('drive', 'v3', credentials=credentials)
-                        logger.info(f"Authenticated as user for project: {project}")
-                except (json.JSONDecodeError, KeyError):
-                    # If we can't parse it as JSON, try application default credentials
-                    logger.info("Using application default credentials")
-                    credentials, project = default(scopes=[
-                        'https://www.googleapis.com/auth/drive',
-                        'https://www.googleapis.com/auth/drive.readonly',
-                        'https://www.googleapis.com/auth/drive.metadata.readonly',
-                        'https://www.googleapis.com/auth/drive.file'
-                    ])
-                    self.drive_service = build('drive', 'v3', credentials=credentials)
-                    logger.info(f"Authenticated as user for project: {project}")
-            else:
-                # Fallback to user credentials (application default)
-                logger.info("Using application default credentials")
-                credentials, project = default(scopes=[
-                    'https://www.googleapis.com/auth/drive',
-                    'https://www.googleapis.com/auth/drive.readonly',
-                    'https://www.googleapis.com/auth/drive.metadata.readonly',
-                    'https://www.googleapis.com/auth/drive.file'
-                ])
-                self.drive_service = build('drive', 'v3', credentials=credentials)
-                logger.info(f"Authenticated as user for project: {project}")
+                    cred_data = load_credentials_file(credentials_path)
+                    kind = _credential_kind(cred_data)
+                except orjson.JSONDecodeError:
+                    pass
+            
+            drive_service = DRIVE_SERVICE_FACTORIES[kind](cred_data, self.target_user)
         except Exception as e:
             logger.error(f"Failed to initialize Drive service: {e}")
             logger.info("Drive service will not be available. Please set up authentication.")
+        return drive_service
     
     def get_supported_mime_types(self):
-        """Get list of supported MIME types for scanning"""
-        return [
-            'application/pdf',
-            'text/plain',
-            'text/csv',
-            'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            'application/vnd.ms-powerpoint',
-            'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            'application/vnd.google-apps.document',
-            'application/vnd.google-apps.spreadsheet',
-            'application/vnd.google-apps.presentation',
-            'application/rtf',
-            'text/html'
-        ]
+        """Get the set of supported MIME types for scanning"""
+        return SUPPORTED_MIME_TYPES
     
     def should_scan_file(self, file_metadata):
         """Determine if a file should be scanned based on its properties"""
@@ -158,48 +258,94 @@ class DriveMonitor:
         name = file_metadata.get('name', '')
         
         # Check MIME type
-        if mime_type not in self.get_supported_mime_types():
+        if mime_type not in SUPPORTED_MIME_TYPES:
             return False, f"Unsupported MIME type: {mime_type}"
         
-        # Check file size (limit to 10MB for DLP API)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if size > max_size:
-            return False, f"File too large: {size} bytes (max: {max_size})"
+        # Check file size
+        if size > MAX_SCAN_FILE_SIZE:
+            return False, f"File too large: {size} bytes (max: {MAX_SCAN_FILE_SIZE})"
         
         # Skip system files
-        if name.startswith('.') or name.startswith('~'):
+        if name.startswith(SYSTEM_FILE_PREFIXES):
             return False, "System file"
         
         return True, "File eligible for scanning"
     
+    def iter_eligible(self, files):
+        """Yield (file_metadata, reason) for each file, with reason None when it should be scanned.
+        
+        Files annotated by list_drive_files reuse their scan_eligible and
+        scan_reason instead of being checked again.
+        """
+        for file_metadata in files:
+            if 'scan_eligible' in file_metadata:
+                should_scan, reason = file_metadata['scan_eligible'], file_metadata['scan_reason']
+            else:
+                should_scan, reason = self.should_scan_file(file_metadata)
+            yield file_metadata, None if should_scan else reason
+    
     def publish_scan_request(self, file_metadata):
-        """Publish a scan request to Pub/Sub"""
+        """Queue a scan request on the batching publisher and return its future.
+        
+        The future is left unresolved so a loop of publishes shares batched
+        Publish RPCs; use resolve_message_id once the loop is done. A file
+        version requested within SCAN_REQUEST_DEDUP_TTL seconds gets the
+        earlier request's future instead of being published again.
+        """
         try:
             if not self.publisher or not self.topic_path:
                 logger.warning("PubSub client not initialized, skipping scan request")
                 return None
-                
-            message_data = {
-                'file_id': file_metadata['id'],
-                'file_name': file_metadata['name'],
-                'mime_type': file_metadata['mimeType'],
-                'size': file_metadata.get('size', 0),
-                'modified_time': file_metadata.get('modifiedTime'),
-                'owner': file_metadata.get('owners', [{}])[0].get('emailAddress', 'unknown'),
-                'request_timestamp': datetime.utcnow().isoformat()
-            }
             
-            message_json = json.dumps(message_data)
-            future = self.publisher.publish(self.topic_path, message_json.encode('utf-8'))
-            message_id = future.result()
-            logger.info(f"Published scan request for file {file_metadata['id']}: {message_id}")
+            key = (file_metadata['id'], file_metadata.get('modifiedTime'))
+            with self._recent_requests_lock:
+                future = self._recent_requests.get(key)
+                # Failed publishes are retried rather than reused
+                if future is not None and not (future.done() and future.exception() is not None):
+                    logger.info(f"Scan request for file {file_metadata['id']} already published, reusing it")
+                    return future
+                
+                future = self._publish(file_metadata)
+                self._recent_requests[key] = future
+                return future
+        except Exception as e:
+            logger.error(f"Failed to publish scan request: {e}")
+            return None
+    
+    def _publish(self, file_metadata):
+        """Publish one scan request message, returning its future"""
+        message_data = {
+            'file_id': file_metadata['id'],
+            'file_name': file_metadata['name'],
+            'mime_type': file_metadata['mimeType'],
+            'size': file_metadata.get('size', 0),
+            'modified_time': file_metadata.get('modifiedTime'),
+            'owner': file_metadata.get('owners', [{}])[0].get('emailAddress', 'unknown'),
+            # orjson writes naive datetimes in the same form as isoformat()
+            'request_timestamp': datetime.utcnow()
+        }
+        
+        return self.publisher.publish(self.topic_path, orjson.dumps(message_data))
+    
+    def resolve_message_id(self, file_id, future):
+        """Wait for a publish future from publish_scan_request and return its message id"""
+        if future is None:
+            return None
+        try:
+            message_id = future.result(timeout=PUBLISH_RESULT_TIMEOUT)
+            logger.info(f"Published scan request for file {file_id}: {message_id}")
             return message_id
         except Exception as e:
             logger.error(f"Failed to publish scan request: {e}")
             return None
     
-    def list_drive_files(self, query=None, max_results=100):
-        """List files in Google Drive"""
+    def list_drive_files(self, query=None, max_results=None, max_pages=DRIVE_LIST_MAX_PAGES, scannable_only=False):
+        """List files in Google Drive, following nextPageToken across pages.
+        
+        Stops after max_results files (all files when None) or max_pages
+        pages; 'truncated' in the result says whether more files remained.
+        With scannable_only, Drive returns only files of supported MIME types.
+        """
         try:
             if not self.drive_service:
                 return {
@@ -212,14 +358,30 @@ class DriveMonitor:
             # Default query to exclude trashed files
             if not query:
                 query = "trashed=false"
+            if scannable_only:
+                query = f"({query}) and ({SUPPORTED_MIME_TYPES_QUERY})"
             
-            results = self.drive_service.files().list(
+            files = []
+            pages = 0
+            truncated = False
+            files_api = self.drive_service.files()
+            list_request = files_api.list(
                 q=query,
-                pageSize=max_results,
-                fields="nextPageToken, files(id, name, mimeType, size, modifiedTime, owners, parents)"
-            ).execute()
-            
-            files = results.get('files', [])
+                pageSize=min(DRIVE_LIST_PAGE_SIZE, max_results or DRIVE_LIST_PAGE_SIZE),
+                fields=DRIVE_LIST_FIELDS
+            )
+            while list_request is not None:
+                if pages >= max_pages:
+                    truncated = True
+                    break
+                results = list_request.execute()
+                pages += 1
+                files.extend(results.get('files', []))
+                list_request = files_api.list_next(list_request, results)
+                if max_results is not None and len(files) >= max_results:
+                    truncated = len(files) > max_results or list_request is not None
+                    del files[max_results:]
+                    break
             
             # Add scan eligibility information
             for file in files:
@@ -229,7 +391,8 @@ class DriveMonitor:
             
             return {
                 'files': files,
-                'total': len(files)
+                'total': len(files),
+                'truncated': truncated
             }
             
         except Exception as e:
@@ -242,37 +405,47 @@ class DriveMonitor:
             }
     
     def get_file_metadata(self, file_id):
-        """Get metadata for a specific file"""
+        """Get metadata for a specific file, reusing it for FILE_METADATA_TTL seconds"""
         try:
+            with self._file_metadata_lock:
+                file_metadata = self._file_metadata.get(file_id)
+            if file_metadata is not None:
+                # Callers annotate the result, so keep the cached copy clean
+                return dict(file_metadata)
+            
             if not self.drive_service:
                 raise Exception("Drive service not initialized")
             
             file_metadata = self.drive_service.files().get(
                 fileId=file_id,
-                fields="id, name, mimeType, size, modifiedTime, owners, parents, permissions"
+                fields=DRIVE_DETAIL_FIELDS
             ).execute()
             
-            return file_metadata
+            with self._file_metadata_lock:
+                self._file_metadata[file_id] = file_metadata
+            return dict(file_metadata)
             
         except Exception as e:
             logger.error(f"Error getting file metadata: {e}")
             raise
     
     def setup_push_notifications(self, webhook_url):
-        """Set up push notifications for Drive changes"""
+        """Watch the Drive changes feed from the stored page token, so sweeps pick up where they left off"""
         try:
             if not self.drive_service:
                 raise Exception("Drive service not initialized")
             
             # Create a channel for push notifications
+            now = datetime.now(timezone.utc)
             channel_body = {
-                'id': f'drive-monitor-{datetime.utcnow().strftime("%Y%m%d%H%M%S")}',
+                'id': f'drive-monitor-{now.strftime("%Y%m%d%H%M%S")}',
                 'type': 'web_hook',
                 'address': webhook_url,
-                'expiration': str(int((datetime.utcnow().timestamp() + 86400) * 1000))  # 24 hours
+                'expiration': str(int((now.timestamp() + 86400) * 1000))  # 24 hours
             }
             
-            response = self.drive_service.files().watch(
+            response = self.drive_service.changes().watch(
+                pageToken=self.load_page_token(),
                 body=channel_body
             ).execute()
             
@@ -282,8 +455,110 @@ class DriveMonitor:
         except Exception as e:
             logger.error(f"Error setting up push notifications: {e}")
             raise
+    
+    def enqueue_change_notification(self, channel_id, resource_id, resource_state):
+        """Hand a push notification to the change worker, returning False if it was dropped"""
+        if self._change_worker is None:
+            with self._change_worker_lock:
+                if self._change_worker is None:
+                    self._change_worker = threading.Thread(
+                        target=self._process_notifications, name='drive-change-worker', daemon=True
+                    )
+                    self._change_worker.start()
+        
+        try:
+            self._notifications.put_nowait((channel_id, resource_id, resource_state))
+            return True
+        except queue.Full:
+            return False
+    
+    def _process_notifications(self):
+        """Change worker loop: sweep the changes feed once per burst of notifications"""
+        while True:
+            burst = [self._notifications.get()]
+            deadline = time.monotonic() + WEBHOOK_COALESCE_WINDOW
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    burst.append(self._notifications.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                logger.info(f"Processing {len(burst)} Drive change notifications")
+                self.process_changes()
+            except Exception as e:
+                logger.error(f"Error processing webhook: {e}")
+    
+    def _page_token_blob(self, create=False):
+        """Get the results bucket object storing the changes page token, or None without a bucket"""
+        from src.routes.dlp_scanner import scanner
+        bucket = scanner.results_bucket(create=create)
+        return bucket.blob(CHANGES_PAGE_TOKEN_BLOB) if bucket is not None else None
+    
+    def load_page_token(self):
+        """Get the stored changes page token, starting from Drive's current one if none was stored"""
+        if self.page_token is None:
+            try:
+                blob = self._page_token_blob()
+                if blob is not None:
+                    self.page_token = blob.download_as_text().strip() or None
+            except NotFound:
+                pass
+            except Exception as e:
+                logger.error(f"Error loading changes page token: {e}")
+        
+        if self.page_token is None:
+            start = self.drive_service.changes().getStartPageToken().execute()
+            self.save_page_token(start['startPageToken'])
+        return self.page_token
+    
+    def save_page_token(self, page_token):
+        """Remember where the next changes sweep starts, persisting it across restarts"""
+        self.page_token = page_token
+        try:
+            self._page_token_blob(create=True).upload_from_string(page_token, content_type='text/plain')
+        except Exception as e:
+            logger.error(f"Error saving changes page token: {e}")
+    
+    def process_changes(self):
+        """Publish scan requests for eligible files changed since the last sweep"""
+        if not self.drive_service:
+            raise Exception("Drive service not initialized")
+        
+        page_token = self.load_page_token()
+        pending = []
+        while page_token:
+            changes = self.drive_service.changes().list(
+                pageToken=page_token,
+                pageSize=CHANGES_PAGE_SIZE,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, file({DRIVE_LIST_FILE_FIELDS}))"
+            ).execute()
+            
+            with self._file_metadata_lock:
+                for change in changes.get('changes', []):
+                    self._file_metadata.pop(change.get('fileId'), None)
+            
+            for change in changes.get('changes', []):
+                file_metadata = change.get('file')
+                if file_metadata:
+                    should_scan, reason = self.should_scan_file(file_metadata)
+                    if should_scan:
+                        pending.append((file_metadata['id'], self.publish_scan_request(file_metadata)))
+                    else:
+                        logger.info(f"Skipping file {file_metadata['id']}: {reason}")
+            
+            page_token = changes.get('nextPageToken')
+            if 'newStartPageToken' in changes:
+                # Last page: later changes start from this token
+                self.save_page_token(changes['newStartPageToken'])
+        
+        for file_id, future in pending:
+            self.resolve_message_id(file_id, future)
 
-# Initialize monitor instance
+# Initialize monitor instance; its clients are created on first use
 monitor = DriveMonitor()
 
 @drive_bp.route('/webhook', methods=['POST'])
@@ -297,27 +572,12 @@ def drive_webhook():
         
         logger.info(f"Received webhook: channel={channel_id}, resource={resource_id}, state={resource_state}")
         
-        if resource_state in ['update', 'add']:
-            # Get the changed file information
-            # Note: Google Drive webhooks don't include file details, so we need to query for recent changes
-            try:
-                # Get recent changes (this is a simplified approach)
-                changes = monitor.drive_service.changes().list(
-                    pageToken='1',  # Start from beginning for demo
-                    fields="changes(file(id, name, mimeType, size, modifiedTime, owners))"
-                ).execute()
-                
-                for change in changes.get('changes', []):
-                    file_metadata = change.get('file')
-                    if file_metadata:
-                        should_scan, reason = monitor.should_scan_file(file_metadata)
-                        if should_scan:
-                            monitor.publish_scan_request(file_metadata)
-                        else:
-                            logger.info(f"Skipping file {file_metadata['id']}: {reason}")
-                
-            except Exception as e:
-                logger.error(f"Error processing webhook: {e}")
+        # Changes feed channels report 'change'; 'sync' only confirms a new channel
+        if resource_state in ['change', 'update', 'add']:
+            # Google Drive webhooks don't include file details, so the change
+            # worker queries the changes feed; answer before that work is done
+            if not monitor.enqueue_change_notification(channel_id, resource_id, resource_state):
+                logger.info("Change worker queue full, a pending sweep covers this notification")
         
         return '', 200
         
@@ -336,10 +596,12 @@ def trigger_scan():
         
         scanned_files = []
         skipped_files = []
+        # Publish futures, resolved after the loop so messages share batches
+        pending = []
         
         if scan_all or query:
             # Scan all files or files matching query
-            files_result = monitor.list_drive_files(query=query)
+            files_result = monitor.list_drive_files(query=query, scannable_only=True)
             
             # Check if list_drive_files returned an error
             if isinstance(files_result, dict) and 'error' in files_result:
@@ -354,51 +616,44 @@ def trigger_scan():
             else:
                 files = files_result  # Backward compatibility
             
-            for file_metadata in files:
-                should_scan, reason = monitor.should_scan_file(file_metadata)
-                if should_scan:
-                    message_id = monitor.publish_scan_request(file_metadata)
-                    scanned_files.append({
-                        'file_id': file_metadata['id'],
-                        'file_name': file_metadata['name'],
-                        'message_id': message_id
-                    })
-                else:
-                    skipped_files.append({
-                        'file_id': file_metadata['id'],
-                        'file_name': file_metadata['name'],
-                        'reason': reason
-                    })
-        
         elif file_ids:
-            # Scan specific files
-            for file_id in file_ids:
-                try:
-                    file_metadata = monitor.get_file_metadata(file_id)
-                    should_scan, reason = monitor.should_scan_file(file_metadata)
-                    if should_scan:
-                        message_id = monitor.publish_scan_request(file_metadata)
-                        scanned_files.append({
-                            'file_id': file_id,
-                            'file_name': file_metadata['name'],
-                            'message_id': message_id
-                        })
-                    else:
-                        skipped_files.append({
-                            'file_id': file_id,
-                            'file_name': file_metadata['name'],
-                            'reason': reason
-                        })
-                except Exception as e:
+            # Scan specific files, fetching their metadata in batched requests
+            from src.routes.dlp_scanner import scanner
+            metadata, errors = scanner.get_files_metadata(file_ids, fields=SCAN_REQUEST_FILE_FIELDS)
+            files = []
+            for file_id in dict.fromkeys(file_ids):
+                if file_id in metadata:
+                    files.append(metadata[file_id])
+                else:
+                    logger.error(f"Error getting file metadata: {errors[file_id]}")
                     skipped_files.append({
                         'file_id': file_id,
                         'file_name': 'unknown',
-                        'reason': f"Error: {str(e)}"
+                        'reason': f"Error: {str(errors[file_id])}"
                     })
         
         else:
             return jsonify({'error': 'Either file_ids, scan_all=true, or query must be provided'}), 400
         
+        # Check eligibility and queue publishes in one pass
+        for file_metadata, reason in monitor.iter_eligible(files):
+            if reason is None:
+                pending.append(monitor.publish_scan_request(file_metadata))
+                scanned_files.append({
+                    'file_id': file_metadata['id'],
+                    'file_name': file_metadata['name'],
+                    'message_id': None
+                })
+            else:
+                skipped_files.append({
+                    'file_id': file_metadata['id'],
+                    'file_name': file_metadata['name'],
+                    'reason': reason
+                })
+        
+        for entry, future in zip(scanned_files, pending):
+            entry['message_id'] = monitor.resolve_message_id(entry['file_id'], future)
+        
         return jsonify({
             'status': 'success',
             'scanned_files': len(scanned_files),
@@ -430,7 +685,7 @@ def direct_scan():
         
         if scan_all or query:
             # Scan all files or files matching query
-            files_result = monitor.list_drive_files(query=query)
+            files_result = monitor.list_drive_files(query=query, scannable_only=True)
             
             # Check if list_drive_files returned an error
             if isinstance(files_result, dict) and 'error' in files_result:
@@ -444,96 +699,82 @@ def direct_scan():
                 files = files_result['files']
             else:
                 files = files_result  # Backward compatibility
-            
-            for file_metadata in files:
-                should_scan, reason = monitor.should_scan_file(file_metadata)
-                if should_scan:
-                    try:
-                        # Directly scan the file using DLP scanner
-                        scan_response = scanner.download_file_content(file_metadata['id'])
-                        scan_results = scanner.inspect_content(scan_response['content'], {
-                            'file_id': file_metadata['id'],
-                            'name': scan_response['name'],
-                            'mime_type': scan_response['mime_type'],
-                            'size': scan_response['size']
-                        })
-                        
-                        # Store scan results
-                        results_path = scanner.store_scan_results(scan_results, file_metadata['id'])
-                        
-                        scanned_files.append({
-                            'file_id': file_metadata['id'],
-                            'file_name': file_metadata['name'],
-                            'findings_count': scan_results.get('total_findings', 0),
-                            'status': 'sensitive_data_found' if scan_results.get('total_findings', 0) > 0 else 'clean',
-                            'results_stored_at': results_path
-                        })
-                        
-                        logger.info(f"Scanned file {file_metadata['name']}: {scan_results.get('total_findings', 0)} findings")
-                        
-                    except Exception as e:
-                        logger.error(f"Error scanning file {file_metadata['id']}: {e}")
-                        scanned_files.append({
-                            'file_id': file_metadata['id'],
-                            'file_name': file_metadata['name'],
-                            'status': 'error',
-                            'error': str(e)
-                        })
-                else:
-                    skipped_files.append({
-                        'file_id': file_metadata['id'],
-                        'file_name': file_metadata['name'],
-                        'reason': reason
-                    })
         
         elif file_ids:
-            # Scan specific files
-            for file_id in file_ids:
-                try:
-                    file_metadata = monitor.get_file_metadata(file_id)
-                    should_scan, reason = monitor.should_scan_file(file_metadata)
-                    if should_scan:
-                        # Directly scan the file using DLP scanner
-                        scan_response = scanner.download_file_content(file_id)
-                        scan_results = scanner.inspect_content(scan_response['content'], {
-                            'file_id': file_id,
-                            'name': scan_response['name'],
-                            'mime_type': scan_response['mime_type'],
-                            'size': scan_response['size']
-                        })
-                        
-                        # Store scan results
-                        results_path = scanner.store_scan_results(scan_results, file_id)
-                        
-                        scanned_files.append({
-                            'file_id': file_id,
-                            'file_name': file_metadata['name'],
-                            'findings_count': scan_results.get('total_findings', 0),
-                            'status': 'sensitive_data_found' if scan_results.get('total_findings', 0) > 0 else 'clean',
-                            'results_stored_at': results_path
-                        })
-                        
-                        logger.info(f"Scanned file {file_metadata['name']}: {scan_results.get('total_findings', 0)} findings")
-                        
-                    else:
-                        skipped_files.append({
-                            'file_id': file_id,
-                            'file_name': file_metadata['name'],
-                            'reason': reason
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Error scanning file {file_id}: {e}")
+            # Scan specific files, fetching their metadata in batched requests
+            metadata, errors = scanner.get_files_metadata(file_ids)
+            files = []
+            for file_id in dict.fromkeys(file_ids):
+                if file_id in metadata:
+                    files.append(metadata[file_id])
+                else:
+                    logger.error(f"Error scanning file {file_id}: {errors[file_id]}")
                     scanned_files.append({
                         'file_id': file_id,
                         'file_name': 'unknown',
                         'status': 'error',
-                        'error': str(e)
+                        'error': str(errors[file_id])
                     })
         
         else:
             return jsonify({'error': 'Either file_ids, scan_all=true, or query must be provided'}), 400
         
+        to_scan = []
+        for file_metadata, reason in monitor.iter_eligible(files):
+            if reason is None:
+                to_scan.append(file_metadata)
+            else:
+                skipped_files.append({
+                    'file_id': file_metadata['id'],
+                    'file_name': file_metadata['name'],
+                    'reason': reason
+                })
+        
+        # Run the files through the scanner's shared download/inspect/upload
+        # pipeline, reusing the metadata we already have
+        outcomes = scanner.scan_many(
+            [file_metadata['id'] for file_metadata in to_scan],
+            use_cache=False,
+            metadata={file_metadata['id']: file_metadata for file_metadata in to_scan},
+            vault=False
+        )
+        
+        summaries = []
+        for file_metadata in to_scan:
+            file_id = file_metadata['id']
+            file_name = file_metadata['name']
+            try:
+                file_data, scan_results, results_path, _ = outcomes[file_id].result()
+                if file_data.get('skipped'):
+                    skipped_files.append({
+                        'file_id': file_id,
+                        'file_name': file_name,
+                        'reason': f"Unsupported MIME type: {file_data['mime_type']}"
+                    })
+                    continue
+                
+                logger.info(f"Scanned file {file_name}: {scan_results.get('total_findings', 0)} findings")
+                scanned_files.append({
+                    'file_id': file_id,
+                    'file_name': file_name,
+                    'findings_count': scan_results.get('total_findings', 0),
+                    'status': 'sensitive_data_found' if scan_results.get('total_findings', 0) > 0 else 'clean',
+                    'results_stored_at': results_path
+                })
+                summaries.append(scanner.summarize_scan(scan_results, results_path))
+                
+            except Exception as e:
+                logger.error(f"Error scanning file {file_id}: {e}")
+                summaries.append(scanner.summarize_failed_scan(file_id, e, file_name))
+                scanned_files.append({
+                    'file_id': file_id,
+                    'file_name': file_name,
+                    'status': 'error',
+                    'error': str(e)
+                })
+        scanner.record_scan_summaries(summaries)
+        scanner.save_scan_cache()
+        
         return jsonify({
             'status': 'success',
             'scanned_files': len(scanned_files),
@@ -563,52 +804,51 @@ def list_files():
         
         files = result.get('files', [])
         
-        # Add scan eligibility information and scan status
+        # Look up every file's latest scan in one pass over the scan index
+        try:
+            from src.routes.dlp_scanner import scanner
+            bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
+            latest_scans = scanner.latest_summaries(scanner.storage_client.bucket(bucket_name))
+            status_error = None
+        except Exception as e:
+            logger.error(f"Error getting scan statuses: {e}")
+            latest_scans = {}
+            status_error = str(e)
+        
+        # Add scan status; list_drive_files already added scan eligibility
         for file_metadata in files:
-            should_scan, reason = monitor.should_scan_file(file_metadata)
-            file_metadata['scan_eligible'] = should_scan
-            file_metadata['scan_reason'] = reason
-            
-            # Get scan status for this file
-            try:
-                from src.routes.dlp_scanner import scanner
-                bucket_name = os.environ.get('SCAN_RESULTS_BUCKET', 'drive-scanner-results')
-                bucket = scanner.storage_client.bucket(bucket_name)
-                blobs = list(bucket.list_blobs(prefix=f"scan_results/{file_metadata['id']}_"))
-                
-                if blobs:
-                    # File has been scanned
-                    latest_blob = max(blobs, key=lambda b: b.time_created)
-                    content = latest_blob.download_as_text()
-                    scan_result = json.loads(content)
-                    
-                    file_metadata['scan_status'] = {
-                        'status': 'sensitive_data_found' if scan_result.get('total_findings', 0) > 0 else 'clean',
-                        'findings_count': scan_result.get('total_findings', 0),
-                        'scan_timestamp': scan_result.get('scan_timestamp'),
-                        'last_scan': latest_blob.updated.isoformat() if latest_blob.updated else None
-                    }
-                else:
-                    # File has not been scanned
-                    file_metadata['scan_status'] = {
-                        'status': 'not_scanned',
-                        'findings_count': 0,
-                        'scan_timestamp': None,
-                        'last_scan': None
-                    }
-            except Exception as e:
-                logger.error(f"Error getting scan status for file {file_metadata['id']}: {e}")
+            summary = latest_scans.get(file_metadata['id'])
+            if status_error:
                 file_metadata['scan_status'] = {
                     'status': 'error',
                     'findings_count': 0,
                     'scan_timestamp': None,
                     'last_scan': None,
-                    'error': str(e)
+                    'error': status_error
+                }
+            elif summary:
+                # File has been scanned
+                file_metadata['scan_status'] = {
+                    'status': summary['status'],
+                    'findings_count': summary['findings_count'],
+                    'scan_timestamp': summary['scan_timestamp'],
+                    'last_scan': summary.get('last_modified')
+                }
+                if summary.get('error'):
+                    file_metadata['scan_status']['error'] = summary['error']
+            else:
+                # File has not been scanned
+                file_metadata['scan_status'] = {
+                    'status': 'not_scanned',
+                    'findings_count': 0,
+                    'scan_timestamp': None,
+                    'last_scan': None
                 }
         
         return jsonify({
             'files': files,
-            'total': len(files)
+            'total': len(files),
+            'truncated': result.get('truncated', False)
         })
         
     except Exception as e:
@@ -661,12 +901,11 @@ def list_domain_users():
         # Use Admin SDK to list users
         credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
         if credentials_path and os.path.exists(credentials_path):
-            with open(credentials_path, 'r') as f:
-                cred_data = json.load(f)
+            cred_data = load_credentials_file(credentials_path)
             
             if 'type' in cred_data and cred_data['type'] == 'service_account':
-                base_credentials = service_account.Credentials.from_service_account_file(
-                    credentials_path,
+                base_credentials = service_account.Credentials.from_service_account_info(
+                    cred_data,
                     scopes=[
                         'https://www.googleapis.com/auth/admin.directory.user.readonly',
                         'https://www.googleapis.com/auth/drive',
@@ -695,8 +934,7 @@ def list_user_files(user_email):
     """List files for a specific user"""
     try:
         # Initialize drive service with user impersonation
-        drive_monitor = DriveMonitor()
-        drive_monitor._init_drive_service(target_user=user_email)
+        drive_monitor = DriveMonitor(target_user=user_email)
         
         files = drive_monitor.list_drive_files()
         return jsonify(files)
@@ -715,8 +953,7 @@ def bulk_user_scan():
         for user_email in users:
             try:
                 # Initialize drive service for this user
-                drive_monitor = DriveMonitor()
-                drive_monitor._init_drive_service(target_user=user_email)
+                drive_monitor = DriveMonitor(target_user=user_email)
                 
                 # Get user's files
                 files = drive_monitor.list_drive_files()
@@ -753,12 +990,11 @@ def discover_active_users():
     try:
         credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
         if credentials_path and os.path.exists(credentials_path):
-            with open(credentials_path, 'r') as f:
-                cred_data = json.load(f)
+            cred_data = load_credentials_file(credentials_path)
             
             if 'type' in cred_data and cred_data['type'] == 'service_account':
-                base_credentials = service_account.Credentials.from_service_account_file(
-                    credentials_path,
+                base_credentials = service_account.Credentials.from_service_account_info(
+                    cred_data,
                     scopes=[
                         'https://www.googleapis.com/auth/admin.directory.user.readonly',
                         'https://www.googleapis.com/auth/drive',
@@ -798,9 +1034,14 @@ def discover_active_users():
         logger.error(f"Error discovering active users: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Liveness probes hit /health constantly, so its usual body is a constant
+_HEALTH_BODY = b'{"service":"Drive Monitor","status":"healthy"}'
+
 @drive_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (?verbose=1 adds the server time)"""
+    if not request.args.get('verbose'):
+        return Response(_HEALTH_BODY, mimetype='application/json')
     return jsonify({
         'status': 'healthy',
         'service': 'Drive Monitor',
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the DLPScanner's chunking, packing, batch sizing and scan pipeline.
+DLP and Drive are replaced by in-memory fakes, so no credentials are needed.
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+import pytest
+from google.cloud import dlp_v2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.routes import dlp_scanner as dlp_module
+from src.routes.dlp_scanner import DLPScanner
+
+SSN = b"123-45-6789"
+
+
+class FakeDLPClient:
+    """Reports a finding for every match of its patterns, like DLP's inspect_content"""
+
+    def __init__(self, patterns=(rb"\d{3}-\d{2}-\d{4}",), truncate_packed=False):
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.truncate_packed = truncate_packed
+        self.requests = []
+
+    def inspect_content(self, request=None):
+        self.requests.append(request)
+        item = request['item']
+        if 'byte_item' in item:
+            data = bytes(item['byte_item']['data'])
+            packed = item['byte_item']['type_'] == dlp_v2.ByteContentItem.BytesType.TEXT_UTF8
+        else:
+            data = item['value'].encode('utf-8')
+            packed = False
+
+        findings = [
+            dlp_v2.Finding(
+                info_type=dlp_v2.InfoType(name='US_SOCIAL_SECURITY_NUMBER'),
+                likelihood=dlp_v2.Likelihood.LIKELY,
+                quote=match.group().decode('utf-8', 'replace'),
+                location=dlp_v2.Location(byte_range=dlp_v2.Range(start=match.start(), end=match.end()))
+            )
+            for pattern in self.patterns
+            for match in pattern.finditer(data)
+        ]
+        return dlp_v2.InspectContentResponse(result=dlp_v2.InspectResult(
+            findings=findings,
+            findings_truncated=packed and self.truncate_packed
+        ))
+
+
+def make_scanner(dlp_client=None):
+    scanner = DLPScanner()
+    scanner.project_id = 'test-project'
+    # cached_property, so the fake just takes the client's place
+    scanner.__dict__['dlp_client'] = dlp_client or FakeDLPClient()
+    return scanner
+
+
+def byte_ranges(scan_result):
+    return [(f['location']['byte_range']['start'], f['location']['byte_range']['end'])
+            for f in scan_result['findings']]
+
+
+class TestIterChunks:
+    def test_small_content_is_one_chunk(self):
+        scanner = make_scanner()
+        assert list(scanner._iter_chunks(b"abc", size=10, overlap=3)) == [(0, b"abc")]
+
+    @pytest.mark.parametrize('length', [10, 11, 17, 18, 24, 25, 100])
+    def test_chunks_overlap_and_cover_content(self, length):
+        scanner = make_scanner()
+        content = bytes(range(length))
+        chunks = list(scanner._iter_chunks(content, size=10, overlap=3))
+
+        for offset, chunk in chunks:
+            assert content[offset:offset + len(chunk)] == chunk
+            assert len(chunk) <= 10
+        for (offset, chunk), (next_offset, _) in zip(chunks, chunks[1:]):
+            assert next_offset == offset + 7
+        last_offset, last_chunk = chunks[-1]
+        assert last_offset + len(last_chunk) == length
+
+    def test_str_offsets_are_utf8_byte_offsets(self):
+        scanner = make_scanner()
+        content = "é" * 20
+        chunks = list(scanner._iter_chunks(content, size=10, overlap=3))
+
+        encoded = content.encode('utf-8')
+        for offset, chunk in chunks:
+            assert encoded[offset:offset + len(chunk.encode('utf-8'))] == chunk.encode('utf-8')
+
+
+    @pytest.mark.parametrize('length', [0, 9, 10, 11, 17, 18, 24, 25, 100])
+    def test_spooled_files_chunk_like_bytes(self, length):
+        scanner = make_scanner()
+        content = bytes(range(length))
+        with tempfile.TemporaryFile() as fh:
+            fh.write(content)
+            assert list(scanner._iter_chunks(fh, size=10, overlap=3)) == \
+                list(scanner._iter_chunks(content, size=10, overlap=3))
+
+
+class FakeMediaRequest:
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+    def execute(self, num_retries=0):
+        start, end = self.headers['Range'][len('bytes='):].split('-')
+        return self.content[int(start):int(end) + 1 if end else None]
+
+
+class FakeDriveFiles:
+    def __init__(self, content):
+        self.content = content
+
+    def get_media(self, fileId=None):
+        return FakeMediaRequest(self.content)
+
+
+class TestDownloadRanges:
+    def test_ranges_are_reassembled_in_order(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DRIVE_RANGE_SIZE', 7)
+        scanner = make_scanner()
+        content = bytes(range(100))
+        files = FakeDriveFiles(content)
+        scanner.__dict__['drive_service'] = type('Drive', (), {'files': lambda self: files})()
+
+        with scanner._download_ranges('f', 95) as buffer:
+            # The open-ended last range picks up bytes past the listed size
+            assert buffer.tell() == 100
+            buffer.seek(0)
+            assert buffer.read() == content
+
+
+class TestInspectContent:
+    def test_finding_in_overlap_is_reported_once(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_SIZE', 100)
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_OVERLAP', 20)
+        scanner = make_scanner()
+        content = b"x" * 85 + SSN + b"x" * 100
+
+        result = scanner.inspect_content(content, {'name': 'a.txt', 'mime_type': 'text/plain'})
+
+        assert byte_ranges(result) == [(85, 96)]
+
+    def test_finding_after_first_chunk_has_whole_file_offsets(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_SIZE', 100)
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_OVERLAP', 20)
+        scanner = make_scanner()
+        content = b"x" * 150 + SSN + b"x" * 100
+
+        result = scanner.inspect_content(content, {'name': 'a.txt', 'mime_type': 'text/plain'})
+
+        assert byte_ranges(result) == [(150, 161)]
+        assert content[150:161] == SSN
+
+    def test_spooled_text_matches_in_memory_text(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_SIZE', 100)
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_OVERLAP', 20)
+        scanner = make_scanner()
+        content = b"x" * 85 + SSN + b"x" * 150 + SSN
+        file_info = {'name': 'a.txt', 'mime_type': 'text/plain'}
+
+        with tempfile.TemporaryFile() as fh:
+            fh.write(content)
+            spooled = scanner.inspect_content(fh, file_info)
+
+        assert byte_ranges(spooled) == byte_ranges(scanner.inspect_content(content, file_info))
+
+    def test_binary_content_is_sent_whole(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DLP_CHUNK_SIZE', 100)
+        dlp_client = FakeDLPClient()
+        scanner = make_scanner(dlp_client)
+
+        scanner.inspect_content(b"%PDF" + b"x" * 300, {'name': 'a.pdf', 'mime_type': 'application/pdf'})
+
+        assert len(dlp_client.requests) == 1
+
+    def test_oversized_binary_content_is_rejected(self, monkeypatch):
+        monkeypatch.setattr(dlp_module, 'DLP_MAX_BINARY_SIZE', 100)
+        dlp_client = FakeDLPClient()
+        scanner = make_scanner(dlp_client)
+
+        with pytest.raises(ValueError):
+            scanner.inspect_content(b"x" * 101, {'name': 'a.pdf', 'mime_type': 'application/pdf'})
+        assert dlp_client.requests == []
+
+
+class TestInspectPacked:
+    def test_findings_are_mapped_back_to_their_files(self):
+        dlp_client = FakeDLPClient()
+        scanner = make_scanner(dlp_client)
+        files = [
+            (b"clean", {'file_id': 'a'}),
+            (b"id " + SSN, {'file_id': 'b'}),
+            ("ssn " + SSN.decode() + " twice " + SSN.decode(), {'file_id': 'c'}),
+        ]
+
+        results = scanner.inspect_packed(files)
+
+        assert len(dlp_client.requests) == 1
+        assert [r['file_info']['file_id'] for r in results] == ['a', 'b', 'c']
+        assert byte_ranges(results[0]) == []
+        assert byte_ranges(results[1]) == [(3, 14)]
+        assert byte_ranges(results[2]) == [(4, 15), (22, 33)]
+
+    def test_matches_across_the_delimiter_are_dropped(self):
+        # Stands in for any infoType whose match runs from one file into the next
+        scanner = make_scanner(FakeDLPClient(patterns=(rb"\d{3}-\d{2}-\d{4}", rb"tail[\s\S]+?head")))
+        files = [(b"ends with tail", {'file_id': 'a'}), (b"head then " + SSN, {'file_id': 'b'})]
+
+        results = scanner.inspect_packed(files)
+
+        assert byte_ranges(results[0]) == []
+        assert byte_ranges(results[1]) == [(10, 21)]
+
+    def test_truncated_findings_fall_back_to_per_file_requests(self):
+        dlp_client = FakeDLPClient(truncate_packed=True)
+        scanner = make_scanner(dlp_client)
+        files = [(b"id " + SSN, {'file_id': 'a', 'mime_type': 'text/plain'}),
+                 (SSN, {'file_id': 'b', 'mime_type': 'text/plain'})]
+
+        results = scanner.inspect_packed(files)
+
+        assert len(dlp_client.requests) == 3
+        assert byte_ranges(results[0]) == [(3, 14)]
+        assert byte_ranges(results[1]) == [(0, 11)]
+
+
+class TestDriveBatchSize:
+    def test_throttling_halves_the_batch_size(self):
+        scanner = make_scanner()
+        scanner._drive_batch_size = 40
+
+        scanner._adapt_drive_batch_size(10, throttled=True)
+        assert scanner._drive_batch_size == 20
+
+        for _ in range(10):
+            scanner._adapt_drive_batch_size(0, throttled=True)
+        assert scanner._drive_batch_size == 1
+
+    def test_clean_batches_grow_the_batch_size_up_to_the_max(self):
+        scanner = make_scanner()
+        start = scanner._drive_batch_size
+
+        scanner._adapt_drive_batch_size(dlp_module.DRIVE_BATCH_GROWTH_WINDOW - 1, throttled=False)
+        assert scanner._drive_batch_size == start
+        scanner._adapt_drive_batch_size(1, throttled=False)
+        assert scanner._drive_batch_size == start + dlp_module.DRIVE_BATCH_GROWTH_STEP
+
+        scanner._adapt_drive_batch_size(dlp_module.DRIVE_BATCH_GROWTH_WINDOW * 100, throttled=False)
+        assert scanner._drive_batch_size == dlp_module.DRIVE_BATCH_SIZE_MAX
+
+    def test_throttling_resets_growth_progress(self):
+        scanner = make_scanner()
+        start = scanner._drive_batch_size
+
+        scanner._adapt_drive_batch_size(dlp_module.DRIVE_BATCH_GROWTH_WINDOW - 1, throttled=False)
+        scanner._adapt_drive_batch_size(0, throttled=True)
+        scanner._adapt_drive_batch_size(1, throttled=False)
+        assert scanner._drive_batch_size == start // 2
+
+
+class TestBlobTimestamp:
+    @pytest.mark.parametrize("timestamp", [
+        datetime(2026, 1, 2, 3, 4, 5, 678),
+        datetime(2026, 12, 31, 23, 59, 59),
+    ])
+    def test_matches_strftime(self, timestamp):
+        assert dlp_module._blob_timestamp(timestamp.isoformat()) == timestamp.strftime('%Y%m%d_%H%M%S')
+
+
+class FakeResultBlob:
+    def __init__(self, name, content):
+        self.name = name
+        self.content = content
+
+    def download_as_bytes(self):
+        if self.content is None:
+            raise IOError("download failed")
+        return self.content
+
+
+class TestLoadScanResults:
+    def test_results_keep_blob_order_and_skip_unreadable_blobs(self):
+        scanner = make_scanner()
+        blobs = [
+            FakeResultBlob('scan_results/a.json', b'{"total_findings": 1}'),
+            FakeResultBlob('scan_results/b.json', None),
+            FakeResultBlob('scan_results/c.json', b'not json'),
+            FakeResultBlob('scan_results/d.json', b'{"total_findings": 0}'),
+        ]
+
+        loaded = [(blob.name, result) for blob, result in scanner.load_scan_results(blobs)]
+
+        assert loaded == [
+            ('scan_results/a.json', {'total_findings': 1}),
+            ('scan_results/d.json', {'total_findings': 0}),
+        ]
+
+
+class TestLatestSummaries:
+    def test_keeps_each_files_newest_scan_and_caches_the_map(self, monkeypatch):
+        scanner = make_scanner()
+        summaries = [
+            {'file_id': 'a', 'scan_timestamp': '2024-01-02T00:00:00', 'results_stored_at': 'scan_results/a_20240102_000000.json'},
+            {'file_id': 'a', 'scan_timestamp': '2024-01-01T00:00:00', 'results_stored_at': 'scan_results/a_20240101_000000.json'},
+            {'file_id': 'b', 'scan_timestamp': '2024-01-01T00:00:00', 'results_stored_at': 'scan_results/b_20240101_000000.json'},
+        ]
+        loads = []
+        monkeypatch.setattr(scanner, 'load_all_summaries', lambda bucket: loads.append(bucket) or summaries)
+        bucket = FakeResultBlob('results', None)
+
+        latest = scanner.latest_summaries(bucket)
+
+        assert latest == {'a': summaries[0], 'b': summaries[2]}
+        assert scanner.latest_summaries(bucket) is latest
+        assert len(loads) == 1
+
+    def test_failed_rescan_is_the_newest_scan(self, monkeypatch):
+        scanner = make_scanner()
+        failed = scanner.summarize_failed_scan('a', IOError("download failed"))
+        summaries = [
+            {'file_id': 'a', 'scan_timestamp': '2024-01-01T00:00:00', 'results_stored_at': 'scan_results/a_20240101_000000.json'},
+            failed,
+        ]
+        monkeypatch.setattr(scanner, 'load_all_summaries', lambda bucket: summaries)
+
+        latest = scanner.latest_summaries(FakeResultBlob('results', None))
+
+        assert latest == {'a': failed}
+
+
+class TestScanStatistics:
+    def test_failed_scan_lowers_success_rate_and_is_not_clean(self):
+        scanner = make_scanner()
+        summaries = [
+            {'file_id': 'a', 'findings_count': 2, 'scan_timestamp': '2024-01-01T00:00:00'},
+            {'file_id': 'b', 'findings_count': 0, 'scan_timestamp': '2024-01-01T00:00:00'},
+            {'file_id': 'c', 'findings_count': 0, 'scan_timestamp': '2024-01-01T00:00:00'},
+            scanner.summarize_failed_scan('d', IOError("download failed")),
+        ]
+
+        stats = dlp_module.scan_statistics(summaries)
+
+        assert stats['errored'] == 1
+        assert stats['files_with_findings'] == 1
+        assert stats['clean_files'] == 2
+        assert stats['scan_success_rate'] == 75.0
+        assert stats['clean_file_rate'] == 50.0
+
+    def test_empty_scan_data_has_zero_rates(self):
+        stats = dlp_module.scan_statistics([])
+
+        assert stats['scan_success_rate'] == 0
+        assert stats['clean_file_rate'] == 0
+
+
+class TestCompileCustomPattern:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        dlp_module.compile_custom_pattern.cache_clear()
+        yield
+        dlp_module.compile_custom_pattern.cache_clear()
+
+    @pytest.mark.parametrize("pattern", [r"(a+)+$", r"(\w*\d)*x", r"(?:ab|c+)*"])
+    def test_re_fallback_rejects_nested_quantifiers(self, monkeypatch, pattern):
+        monkeypatch.setattr(dlp_module, 'prefilter_re', re)
+        with pytest.raises(re.error):
+            dlp_module.compile_custom_pattern(pattern)
+
+    @pytest.mark.parametrize("pattern", [r"EMP-\d{6}", r"(ab)+c", r"(a?b)+", r"[A-Z]{2}\d+"])
+    def test_re_fallback_accepts_single_quantifiers(self, monkeypatch, pattern):
+        monkeypatch.setattr(dlp_module, 'prefilter_re', re)
+        assert dlp_module.compile_custom_pattern(pattern).search("EMP-123456 abc AB12")
+
+    def test_re2_accepts_nested_quantifiers_and_rejects_non_re2_syntax(self):
+        if dlp_module.prefilter_re is re:
+            pytest.skip("google-re2 is not installed")
+        assert dlp_module.compile_custom_pattern(r"(a+)+$").search("a" * 64 + "!") is None
+        with pytest.raises(re.error):
+            dlp_module.compile_custom_pattern(r"(a)\1")
+
+
+class TestScanMany:
+    FILES = {
+        'small1': ('text/plain', b"id " + SSN),
+        'small2': ('text/csv', b"clean,row"),
+        'large': ('text/plain', b"y" * (dlp_module.DLP_PACK_FILE_SIZE + 1)),
+        'image': ('image/png', b"\x89PNG"),
+        'broken': ('text/plain', None),
+    }
+
+    def make_pipeline_scanner(self):
+        dlp_client = FakeDLPClient()
+        scanner = make_scanner(dlp_client)
+        stored = []
+        # Held until every file is queued, so packing doesn't depend on timing
+        self.downloads_released = threading.Event()
+
+        def download_media(file_id, file_metadata):
+            self.downloads_released.wait(timeout=10)
+            mime_type, content = self.FILES[file_id]
+            if content is None:
+                raise IOError(f"download failed for {file_id}")
+            if not scanner.is_scannable_mime_type(mime_type):
+                return {'content': b'', 'name': file_id, 'mime_type': mime_type, 'size': 0, 'skipped': True}
+            return {'content': content, 'name': file_id, 'mime_type': mime_type, 'size': len(content)}
+
+        def store_scan_results(scan_results, file_id):
+            stored.append(file_id)
+            return f"scan_results/{file_id}_20240101_000000.json"
+
+        scanner._download_media = download_media
+        scanner.store_scan_results = store_scan_results
+        scanner.move_to_vault = lambda file_id, scan_results, file_data=None: (
+            f"vault/{file_id}" if scan_results['total_findings'] else None)
+        scanner.remember_scan = lambda *args: None
+        return scanner, dlp_client, stored
+
+    def scan(self, scanner, file_ids):
+        metadata = {file_id: {'id': file_id, 'name': file_id, 'mimeType': self.FILES[file_id][0]}
+                    for file_id in file_ids}
+        outcomes = scanner.scan_many(file_ids, use_cache=False, metadata=metadata)
+        self.downloads_released.set()
+        return {file_id: future.exception(timeout=10) or future.result() for file_id, future in outcomes.items()}
+
+    def test_small_text_files_share_a_dlp_request(self):
+        scanner, dlp_client, stored = self.make_pipeline_scanner()
+
+        results = self.scan(scanner, ['small1', 'small2', 'large'])
+
+        assert sorted(stored) == ['large', 'small1', 'small2']
+        # One packed request for the two small files, one for the large file
+        assert len(dlp_client.requests) == 2
+        assert results['small1'][1]['total_findings'] == 1
+        assert results['small1'][3] == 'vault/small1'
+        assert results['small2'][1]['total_findings'] == 0
+        assert results['small2'][3] is None
+
+    def test_skipped_and_failed_files_resolve_without_blocking_others(self):
+        scanner, dlp_client, stored = self.make_pipeline_scanner()
+
+        results = self.scan(scanner, ['image', 'broken', 'small1'])
+
+        file_data, scan_results, results_path, vault_path = results['image']
+        assert file_data['skipped'] and scan_results is None and results_path is None
+        assert isinstance(results['broken'], IOError)
+        assert results['small1'][1]['total_findings'] == 1
+        assert stored == ['small1']
+
+    def test_inspection_errors_fail_only_their_files(self):
+        scanner, dlp_client, stored = self.make_pipeline_scanner()
+
+        def failing_inspect(content, file_info, *args, **kwargs):
+            raise RuntimeError("DLP unavailable")
+        scanner.inspect_content = failing_inspect
+
+        results = self.scan(scanner, ['large', 'small1'])
+
+        assert isinstance(results['large'], RuntimeError)
+        assert results['small1'][1]['total_findings'] == 1
+        assert stored == ['small1']
+
+
+class FakeCacheBucket:
+    """One generation-checked blob, like GCS with if_generation_match"""
+
+    def __init__(self, content=None):
+        self.content = content
+        self.generation = 1 if content is not None else 0
+        self.before_upload = None
+        self.uploads = 0
+
+    def get_blob(self, name):
+        return FakeCacheBlob(self) if self.content is not None else None
+
+    def blob(self, name):
+        return FakeCacheBlob(self)
+
+
+class FakeCacheBlob:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.generation = bucket.generation
+
+    def download_as_bytes(self, if_generation_match=None):
+        if if_generation_match not in (None, self.bucket.generation):
+            raise dlp_module.PreconditionFailed("generation changed")
+        return self.bucket.content
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if self.bucket.before_upload:
+            self.bucket.before_upload()
+        self.bucket.uploads += 1
+        if if_generation_match is not None and if_generation_match != self.bucket.generation:
+            raise dlp_module.PreconditionFailed("generation changed")
+        self.bucket.content = data
+        self.bucket.generation += 1
+
+
+class TestSaveScanCache:
+    def make_cache_scanner(self, bucket):
+        scanner = make_scanner()
+        scanner.__dict__['storage_client'] = type('FakeStorage', (), {'bucket': lambda self, name: bucket})()
+        scanner._scan_cache_updates = {'a': {'hash': 'a1'}}
+        return scanner
+
+    def test_merges_entries_written_by_another_worker_during_the_save(self):
+        bucket = FakeCacheBucket(b'{"b": {"hash": "b1"}}')
+        scanner = self.make_cache_scanner(bucket)
+
+        def concurrent_save():
+            bucket.before_upload = None
+            bucket.content = b'{"b": {"hash": "b1"}, "c": {"hash": "c1"}}'
+            bucket.generation += 1
+        bucket.before_upload = concurrent_save
+
+        scanner.save_scan_cache()
+
+        assert json.loads(bucket.content) == {'a': {'hash': 'a1'}, 'b': {'hash': 'b1'}, 'c': {'hash': 'c1'}}
+        assert bucket.uploads == 2
+        assert scanner._scan_cache_updates == {}
+
+    def test_creates_the_cache_only_if_it_does_not_exist(self):
+        bucket = FakeCacheBucket()
+        scanner = self.make_cache_scanner(bucket)
+
+        scanner.save_scan_cache()
+
+        assert json.loads(bucket.content) == {'a': {'hash': 'a1'}}
+
+    def test_keeps_updates_when_every_attempt_conflicts(self):
+        bucket = FakeCacheBucket(b'{}')
+        scanner = self.make_cache_scanner(bucket)
+
+        def concurrent_save():
+            bucket.generation += 1
+        bucket.before_upload = concurrent_save
+
+        scanner.save_scan_cache()
+
+        assert bucket.uploads == dlp_module.SCAN_CACHE_SAVE_ATTEMPTS
+        assert scanner._scan_cache_updates == {'a': {'hash': 'a1'}}